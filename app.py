@@ -1,7 +1,11 @@
 # app.py
 import os
+import json
+import hashlib
+import io
+import itertools
+import queue
 import socket
-import smtplib
 import time
 import tempfile
 from datetime import datetime
@@ -9,16 +13,23 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, Request, render_template, request, redirect, url_for, flash, Response, stream_with_context
 from flask_apscheduler import APScheduler
 from werkzeug.utils import secure_filename
 
 # tools
 from tools.portguardian import get_listening_ports, RISKY_PORTS
-from tools.tracenet import TraceNet
-from tools.metaspy import MetaSpyScanner
-from tools.bannerhunter import BannerHunter
-from tools.crawleye import CrawlEye
+from tools.porthistory import get_port_history, port_feed
+from tools.tracenet import TraceNet, bulk_recon, parse_bulk_targets
+from tools.metaspy import HashingSpool, MetaSpyScanner, purge_stale_uploads
+from tools.metabatch import BatchSummary, analyze_batch, iter_uploads
+from tools.bannerhunter import BannerHunter, parse_ports
+from tools.crawleye import CrawlEye, load_wordlist
+from tools.crawlstate import valid_crawl_id
+from tools.resultstore import results
+from tools.jobs import jobs, JobQueueFull
+from tools.outbox import Outbox
+from tools.logsentinel import LOG_ROOTS, LogSentinel, allowed_log_path, default_log_paths, get_log_state
 
 # ===== Flask app setup =====
 app = Flask(__name__)
@@ -30,12 +41,87 @@ SMTP_PORT = int(os.environ.get("SMTP_PORT", 587))
 SENDER_EMAIL = os.environ.get("SENDER_EMAIL", "")
 SENDER_PASSWORD = os.environ.get("SENDER_PASSWORD", "")  # set in env
 RECEIVER_EMAIL = os.environ.get("RECEIVER_EMAIL", "")
+SMTP_STARTTLS = os.environ.get("SMTP_STARTTLS", "1") != "0"
 # =================================================================
 
+# MetaSpy batch pool workers import this module as __mp_main__; background
+# services (mail sender, scheduler, upload purge) only start in the app itself
+SERVING = __name__ != "__mp_main__"
+
+# all report mail goes through one queued, persistent SMTP sender
+outbox = Outbox(SMTP_SERVER, SMTP_PORT, SENDER_EMAIL, SENDER_PASSWORD, starttls=SMTP_STARTTLS)
+if SERVING:
+    outbox.start()
+
+# PortGuardian history sampling
+PORT_SAMPLE_INTERVAL = int(os.environ.get("PORT_SAMPLE_INTERVAL", 60))
+SSE_KEEPALIVE = 15
+
 # Uploads
 ALLOWED_UPLOAD_EXT = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".pdf", ".docx"}
 UPLOAD_DIR = os.environ.get("UPLOAD_DIR", tempfile.gettempdir())
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+if SERVING:
+    purge_stale_uploads(UPLOAD_DIR)
+
+
+class UploadRequest(Request):
+    """File uploads are hashed as they arrive and kept in memory, spilling large ones to an auto-deleted temp file."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool(dir=UPLOAD_DIR)
+
+
+app.request_class = UploadRequest
+
+
+# ---------------- Background jobs ----------------
+def _submit_job(tool, target, params, fn, **view_args):
+    """Queue a scan and send the browser to the tool page that tracks it."""
+    try:
+        job = jobs.submit(tool, target, params, fn, refresh=request.form.get("refresh") == "1")
+    except JobQueueFull as e:
+        flash(f"⚠️ {e}", "warning")
+        return redirect(url_for(tool))
+    return redirect(url_for(tool, job=job.id, **view_args))
+
+
+def _job_context(tool):
+    """Template context for ?job=<id>: the job, plus its result once it is no longer running."""
+    job = jobs.get(request.args.get("job"), tool=tool)
+    if job is None:
+        return {"job": None, "result": None, "target": None, "result_id": None}
+    return {"job": job, "target": job.target, "result_id": job.result_id,
+            "result": None if job.active else job.result}
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": "unknown job"}, 404
+    return job.to_dict()
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": "unknown job"}, 404
+    if job.active:
+        return {**job.to_dict(), "error": "job still running"}, 409
+    return {**job.to_dict(), "result": job.result}
+
+
+@app.route("/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return {"error": "unknown job"}, 404
+    cancelled = jobs.cancel(job_id)
+    if request.form.get("redirect"):
+        return redirect(url_for(job.tool, job=job.id))
+    return {**job.to_dict(), "cancelled": cancelled}
 
 
 # ---------------- Home / Index ----------------
@@ -47,13 +133,19 @@ def index():
 # ---------------- PortGuardian ----------------
 @app.route("/portguardian")
 def portguardian():
-    ports = get_listening_ports()
-    return render_template("portguardian.html", ports=ports, risky_ports=RISKY_PORTS)
+    # the page shows the sampler's snapshot; "Rescan now" runs that same sampler early
+    if request.args.get("refresh") == "1":
+        sample_listening_ports()
+    ports = get_port_history().current()
+    result_id = results.put("portguardian", "localhost", None, ports)
+    return render_template("portguardian.html", ports=ports, risky_ports=RISKY_PORTS, result_id=result_id)
 
 
 @app.route("/send_port_report", methods=["POST"])
 def send_port_report():
-    ports = get_listening_ports()
+    # report exactly what the page showed; the sampler's current snapshot if that expired
+    stored = results.get(request.form.get("result_id"), tool="portguardian")
+    ports = stored["result"] if stored else get_port_history().current()
     risky = [p for p in ports if p.get("risk")]
 
     if not risky:
@@ -70,18 +162,86 @@ def send_port_report():
     msg["To"] = RECEIVER_EMAIL
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            if SENDER_PASSWORD:
-                server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, msg.as_string())
-        flash("📧 Manual report sent successfully!")
+        outbox.send(msg)
+        flash("📧 Manual report queued for delivery!")
     except Exception as e:
-        flash(f"❌ Failed to send manual email: {e}")
+        flash(f"❌ Failed to queue manual email: {e}")
 
     return redirect(url_for("portguardian"))
 
 
+@app.route("/portguardian/stream")
+def portguardian_stream():
+    """
+    Server-Sent Events: one "snapshot" on connect, then a "diff" event with
+    added/removed listeners whenever the shared sampler sees a change.
+    Clients never trigger a collection themselves.
+    """
+    history = get_port_history()
+    feed = port_feed.subscribe()
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def generate():
+        try:
+            # subscribed before the snapshot, so no change can fall in between;
+            # diffs are idempotent on the client if one overlaps the snapshot
+            yield f"retry: {SSE_KEEPALIVE * 1000}\n"
+            yield sse("snapshot", {"ports": history.current()})
+            while True:
+                try:
+                    diff = feed.get(timeout=SSE_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if diff.get("resync"):
+                    yield sse("snapshot", {"ports": history.current()})
+                else:
+                    yield sse("diff", diff)
+        finally:
+            port_feed.unsubscribe(feed)
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _parse_time(value):
+    """Epoch seconds or ISO-8601 (naive = local time); None if missing/invalid."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+@app.route("/portguardian/history")
+def portguardian_history():
+    """?at=<time> -> listeners open at that time (default: now)."""
+    at = request.args.get("at")
+    t = _parse_time(at)
+    if at and t is None:
+        return {"error": "invalid 'at' time"}, 400
+    return {"at": t or time.time(), "ports": get_port_history().listening_at(t)}
+
+
+@app.route("/portguardian/history/<int:port>")
+def portguardian_port_history(port):
+    """First appearance and open/close events of one port (?since=, ?until=)."""
+    history = get_port_history()
+    return {
+        "port": port,
+        "first_seen": history.first_seen(port),
+        "events": history.port_events(port, _parse_time(request.args.get("since")),
+                                      _parse_time(request.args.get("until"))),
+    }
+
+
 # ---------------- TraceNet ----------------
 @app.route("/tracenet", methods=["GET", "POST"])
 def tracenet():
@@ -92,15 +252,31 @@ def tracenet():
             return redirect(url_for("tracenet"))
 
         tracer = TraceNet(target)
-        try:
-            result = tracer.run_recon()
-        except Exception as e:
-            flash(f"❌ TraceNet recon failed: {e}", "danger")
-            result = None
+        return _submit_job("tracenet", target, None, tracer.run_recon)
+
+    return render_template("tracenet.html", **_job_context("tracenet"))
+
+
+@app.route("/tracenet/bulk", methods=["POST"])
+def tracenet_bulk():
+    """
+    Bulk recon over pasted and/or uploaded (CSV) usernames and emails.
+    Results are streamed back as NDJSON as each probe completes.
+    """
+    text = request.form.get("targets", "")
+    upload = request.files.get("target_file")
+    if upload and upload.filename:
+        text += "\n" + upload.read().decode("utf-8", errors="ignore")
 
-        return render_template("tracenet.html", target=target, result=result)
+    targets = parse_bulk_targets(text)
+    if not targets:
+        return Response(json.dumps({"error": "no targets supplied"}) + "\n", status=400, mimetype="application/x-ndjson")
 
-    return render_template("tracenet.html", target=None, result=None)
+    def generate():
+        for res in bulk_recon(targets):
+            yield json.dumps(res) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 @app.route("/tracenet/report", methods=["POST"])
@@ -112,8 +288,11 @@ def send_tracenet_report():
         flash("⚠️ No target supplied for report.", "warning")
         return redirect(url_for("tracenet"))
 
-    tracer = TraceNet(target)
-    result = tracer.run_recon()
+    stored = results.get(request.form.get("result_id"), tool="tracenet")
+    if stored and stored["target"] == target:
+        result = stored["result"]
+    else:
+        _, result = results.get_or_run("tracenet", target, None, TraceNet(target).run_recon)
 
     html = f"<h2>TraceNet Report for {target}</h2>"
     if result.get("type") == "username":
@@ -129,13 +308,18 @@ def send_tracenet_report():
             html += "<p>HIBP API key not configured; no breach information available.</p>"
         elif result.get("status") == "error":
             html += "<p>Error while checking breaches.</p>"
+        elif result.get("status") == "rate_limited":
+            html += ("<p>The breach check was throttled by HaveIBeenPwned and did not run; "
+                     f"breach status is unknown. Retry in about {result.get('retry_after') or 'a few'} seconds.</p>")
         elif result.get("status") == "ok" and result.get("breaches"):
             html += "<ul>"
             for b in result.get("breaches"):
                 html += f"<li><strong>{b.get('Name')}</strong> — {b.get('BreachDate')} — {', '.join(b.get('DataClasses', []))}</li>"
             html += "</ul>"
-        else:
+        elif result.get("status") == "ok":
             html += "<p>No breaches found.</p>"
+        else:
+            html += "<p>No breach information available.</p>"
         subject = f"TraceNet Email Breach Report - {target}"
 
     msg = MIMEMultipart("alternative")
@@ -145,14 +329,10 @@ def send_tracenet_report():
     msg.attach(MIMEText(html, "html"))
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            if SENDER_PASSWORD:
-                server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, msg.as_string())
-        flash("📧 TraceNet report sent successfully!")
+        outbox.send(msg)
+        flash("📧 TraceNet report queued for delivery!")
     except Exception as e:
-        flash(f"❌ Failed to send TraceNet report: {e}")
+        flash(f"❌ Failed to queue TraceNet report: {e}")
 
     return redirect(url_for("tracenet"))
 
@@ -172,12 +352,9 @@ def metaspy():
             flash("⚠️ Unsupported file type.", "warning")
             return redirect(url_for("metaspy"))
 
-        save_path = os.path.join(UPLOAD_DIR, f"metaspy_{int(time.time())}_{filename}")
-        uploaded.save(save_path)
-
         scanner = MetaSpyScanner()
         try:
-            result = scanner.analyze_file(save_path)
+            result = scanner.analyze(uploaded.stream, filename)
         except Exception as e:
             flash(f"❌ MetaSpy failed: {e}", "danger")
             result = {"error": str(e)}
@@ -187,6 +364,37 @@ def metaspy():
     return render_template("metaspy.html", target=None, result=None)
 
 
+@app.route("/metaspy/batch", methods=["POST"])
+def metaspy_batch():
+    """
+    Analyze many files and/or zip archives in one request. Extraction runs on
+    a process pool and per-file results are streamed back as NDJSON as they
+    complete, followed by one {"summary": ...} line aggregating the batch.
+    """
+    uploads = []
+    for f in request.files.getlist("files"):
+        if f and f.filename:
+            # take over the spooled upload: Flask closes request.files when the view returns,
+            # before the streamed response has read them
+            uploads.append((secure_filename(f.filename) or "upload", f.stream))
+            f.stream = io.BytesIO()
+    if not uploads:
+        return Response(json.dumps({"error": "no files supplied"}) + "\n", status=400, mimetype="application/x-ndjson")
+
+    def generate():
+        summary = BatchSummary()
+        try:
+            for res in analyze_batch(iter_uploads(uploads, ALLOWED_UPLOAD_EXT, spool_dir=UPLOAD_DIR)):
+                summary.add(res)
+                yield json.dumps(res, default=str) + "\n"
+            yield json.dumps({"summary": summary.to_dict()}) + "\n"
+        finally:
+            for _, stream in uploads:
+                stream.close()
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 # ---------------- BannerHunter ----------------
 @app.route("/bannerhunter", methods=["GET", "POST"])
 def bannerhunter():
@@ -197,31 +405,48 @@ def bannerhunter():
             flash("⚠️ Please enter a target (hostname or IP).", "warning")
             return redirect(url_for("bannerhunter"))
 
-        ports = None
-        if ports_raw:
-            try:
-                ports = [int(p.strip()) for p in ports_raw.split(",") if p.strip()]
-            except Exception:
-                ports = None
+        ports = parse_ports(ports_raw) if ports_raw else None
 
         hunter = BannerHunter(target, ports=ports)
-        try:
-            result = hunter.scan()
-        except Exception as e:
-            flash(f"❌ BannerHunter scan failed: {e}", "danger")
-            result = None
+        return _submit_job("bannerhunter", target, {"ports": hunter.ports}, hunter.scan, ports=ports_raw or None)
+
+    return render_template("bannerhunter.html", ports=request.args.get("ports"), **_job_context("bannerhunter"))
+
+
+@app.route("/bannerhunter/stream", methods=["POST"])
+def bannerhunter_stream():
+    """
+    Fleet scan: hostnames, IPs and CIDR blocks from the "targets" field and/or
+    an uploaded "target_file" (one per line). Entries are streamed back as
+    NDJSON while the scan runs.
+    """
+    targets_raw = request.form.get("targets", "").strip()
+    ports_raw = request.form.get("ports", "").strip()
+    upload = request.files.get("target_file")
+
+    sources = [targets_raw.splitlines()]
+    if upload and upload.filename:
+        sources.append(upload.stream)
+    if not targets_raw and len(sources) == 1:
+        return Response(json.dumps({"error": "no targets supplied"}) + "\n", status=400, mimetype="application/x-ndjson")
 
-        return render_template("bannerhunter.html", target=target, result=result, ports=ports_raw)
+    ports = parse_ports(ports_raw) if ports_raw else None
+    hunter = BannerHunter(targets_raw or "fleet", ports=ports)
 
-    return render_template("bannerhunter.html", target=None, result=None, ports=None)
+    def generate():
+        for entry in hunter.iter_scan(itertools.chain.from_iterable(sources)):
+            yield json.dumps(entry) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 # ---------------- Scheduled Email (PortGuardian) ----------------
 def generate_risky_report():
-    ports = get_listening_ports()
+    ports = get_port_history().current()
     risky_ports = [p for p in ports if p.get("risk")]
+    changes = get_port_history().changes(time.time() - 24 * 3600, risky_only=True)
 
-    if not risky_ports:
+    if not risky_ports and not changes:
         return "<p>No risky ports were open in the last scan ✅</p>"
 
     html = """
@@ -245,6 +470,30 @@ def generate_risky_report():
         </tr>
         """
     html += "</table>"
+
+    if changes:
+        html += """
+        <p>Risky port changes in the last 24 hours:</p>
+        <table border="1" cellpadding="5" cellspacing="0">
+            <tr>
+                <th>Time</th>
+                <th>Port</th>
+                <th>Event</th>
+                <th>Process</th>
+                <th>PID</th>
+            </tr>
+        """
+        for c in changes:
+            html += f"""
+            <tr>
+                <td>{datetime.fromtimestamp(c['t']).strftime('%Y-%m-%d %H:%M:%S')}</td>
+                <td>{c['port']}</td>
+                <td>{c['event']}</td>
+                <td>{c['process']}</td>
+                <td>{c['pid']}</td>
+            </tr>
+            """
+        html += "</table>"
     return html
 
 
@@ -259,14 +508,10 @@ def send_email_report():
     msg.attach(MIMEText(report_html, "html"))
 
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            if SENDER_PASSWORD:
-                server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.sendmail(SENDER_EMAIL, RECEIVER_EMAIL, msg.as_string())
-        print("✅ Daily Email report sent successfully!")
+        outbox.send(msg)
+        print("✅ Daily Email report queued for delivery!")
     except Exception as e:
-        print("❌ Email sending failed:", e)
+        print("❌ Queueing email failed:", e)
 
 
 # ===== Scheduler =====
@@ -277,7 +522,8 @@ class Config:
 app.config.from_object(Config)
 scheduler = APScheduler()
 scheduler.init_app(app)
-scheduler.start()
+if SERVING:
+    scheduler.start()
 
 
 @scheduler.task("cron", id="daily_email_job", hour=0, minute=0)
@@ -286,6 +532,20 @@ def scheduled_task():
     send_email_report()
 
 
+@scheduler.task("interval", id="port_history_sampler", seconds=PORT_SAMPLE_INTERVAL, next_run_time=datetime.now())
+def sample_listening_ports():
+    # the only periodic collection: feeds both the history store and live dashboards.
+    # One process holds the sampler lease and records; every process follows the
+    # stored rows, so a takeover starts from the latest state and no delta is doubled.
+    history = get_port_history()
+    diffs = [history.refresh()]
+    if history.claim(PORT_SAMPLE_INTERVAL * 3):
+        diffs.append(history.record(get_listening_ports()))
+    for diff in diffs:
+        if diff["added"] or diff["removed"]:
+            port_feed.publish({"t": time.time(), **diff})
+
+
 # ---------------- Static pages ----------------
 @app.route("/phisheye")
 def phisheye():
@@ -297,9 +557,26 @@ def wifiguard():
     return render_template("wifiguard.html")
 
 
-@app.route("/logsentinel")
+@app.route("/logsentinel", methods=["GET", "POST"])
 def logsentinel():
-    return render_template("logsentinel.html")
+    if request.method == "POST":
+        paths = [os.path.abspath(p.strip()) for p in request.form.get("paths", "").splitlines() if p.strip()]
+        paths = paths or default_log_paths()
+        if not paths:
+            flash("⚠️ Please enter at least one log file path.", "warning")
+            return redirect(url_for("logsentinel"))
+        rejected = [p for p in paths if not allowed_log_path(p)]
+        if rejected:
+            flash(f"⚠️ Only logs under {', '.join(LOG_ROOTS)} can be analyzed: {', '.join(rejected)}", "warning")
+            return redirect(url_for("logsentinel"))
+
+        if request.form.get("from_start") == "1":
+            get_log_state().reset(paths)
+        sentinel = LogSentinel(paths)
+        return _submit_job("logsentinel", ", ".join(paths), {"paths": paths}, sentinel.scan)
+
+    return render_template("logsentinel.html", default_paths=default_log_paths(), log_roots=LOG_ROOTS,
+                           **_job_context("logsentinel"))
 
 
 @app.route("/stegguardian")
@@ -318,16 +595,34 @@ def crawleye():
         target = request.form.get("target", "").strip()
         depth = int(request.form.get("depth", 50))
 
-        crawler = CrawlEye(target, max_pages=depth)
-        try:
-            result = crawler.crawl()
-        except Exception as e:
-            flash(f"❌ CrawlEye failed: {e}", "danger")
-            result = None
+        wordlist = None
+        upload = request.files.get("wordlist")
+        if upload and upload.filename:
+            wordlist = list(load_wordlist(upload.stream))
+
+        # resume an interrupted crawl when its ID is given
+        crawl_id = request.form.get("crawl_id", "").strip() or None
+        if crawl_id and not valid_crawl_id(crawl_id):
+            flash("❌ Invalid crawl ID", "danger")
+            return render_template("crawleye.html", result=None)
+
+        crawler = CrawlEye(target, max_pages=depth, wordlist=wordlist, crawl_id=crawl_id)
+        params = {"max_pages": depth, "wordlist": hashlib.sha256("\n".join(wordlist or []).encode()).hexdigest(),
+                  "crawl_id": crawl_id}
+
+        def run(progress, stop):
+            try:
+                return crawler.crawl(progress, stop)
+            except Exception as e:
+                raise RuntimeError(f"{e} (resume with crawl ID {crawler.crawl_id})") from e
 
-        return render_template("crawleye.html", result=result)
+        return _submit_job("crawleye", crawler.base_url, params, run)
 
-    return render_template("crawleye.html", result=None)
+    ctx = _job_context("crawleye")
+    if ctx["job"] is not None:
+        ctx["depth"] = ctx["job"].params.get("max_pages")
+        ctx["crawl_id"] = ctx["job"].params.get("crawl_id")
+    return render_template("crawleye.html", **ctx)
 
 
 # ---- Run the app ----
@@ -0,0 +1,88 @@
+// static/portguardian.js
+// Live PortGuardian table: applies listener diffs pushed over /portguardian/stream.
+(function () {
+  const table = document.getElementById("pg-ports");
+  if (!table || !window.EventSource) return;
+
+  const body = table.tBodies[0];
+  const empty = document.getElementById("pg-empty");
+  const status = document.getElementById("pg-live");
+  const riskyPorts = new Set(JSON.parse(table.dataset.risky || "[]"));
+
+  const keyOf = (p) => `${p.port}|${p.pid}|${p.process}`;
+
+  function cell(text) {
+    const td = document.createElement("td");
+    td.textContent = text;
+    return td;
+  }
+
+  function buildRow(p) {
+    const tr = document.createElement("tr");
+    tr.dataset.key = keyOf(p);
+    tr.dataset.port = p.port;
+    tr.append(cell(p.port), cell(p.service), cell(p.process), cell("Listening"));
+
+    const risk = document.createElement("td");
+    const span = document.createElement("span");
+    if (p.risk || riskyPorts.has(p.port)) {
+      span.style.cssText = "color: red; font-weight: bold;";
+      span.textContent = "⚠️ Risky";
+    } else {
+      span.style.color = "green";
+      span.textContent = "✅ Safe";
+    }
+    risk.append(span);
+    tr.append(risk);
+    return tr;
+  }
+
+  function rowFor(key) {
+    return Array.from(body.rows).find((r) => r.dataset.key === key);
+  }
+
+  function insertSorted(tr) {
+    const port = Number(tr.dataset.port);
+    const next = Array.from(body.rows).find((r) => r.dataset.port && Number(r.dataset.port) > port);
+    body.insertBefore(tr, next || null);
+  }
+
+  function flash(tr, color) {
+    tr.style.transition = "background-color 2s";
+    tr.style.backgroundColor = color;
+    setTimeout(() => { tr.style.backgroundColor = ""; }, 50);
+  }
+
+  function refreshEmpty() {
+    if (empty) empty.style.display = body.querySelector("tr[data-key]") ? "none" : "";
+  }
+
+  // diffs are idempotent: re-adding a present row or removing a missing one is a no-op
+  function applyDiff(diff) {
+    (diff.removed || []).forEach((p) => {
+      const tr = rowFor(keyOf(p));
+      if (tr) tr.remove();
+    });
+    (diff.added || []).forEach((p) => {
+      if (rowFor(keyOf(p))) return;
+      const tr = buildRow(p);
+      insertSorted(tr);
+      flash(tr, "#fff3cd");
+    });
+    refreshEmpty();
+  }
+
+  function applySnapshot(ports) {
+    const wanted = new Map(ports.map((p) => [keyOf(p), p]));
+    Array.from(body.querySelectorAll("tr[data-key]")).forEach((tr) => {
+      if (!wanted.has(tr.dataset.key)) tr.remove();
+    });
+    applyDiff({ added: ports });
+  }
+
+  const source = new EventSource(table.dataset.stream);
+  source.addEventListener("snapshot", (e) => applySnapshot(JSON.parse(e.data).ports));
+  source.addEventListener("diff", (e) => applyDiff(JSON.parse(e.data)));
+  source.onopen = () => { if (status) status.textContent = "🟢 Live"; };
+  source.onerror = () => { if (status) status.textContent = "🟠 Reconnecting…"; };
+})();
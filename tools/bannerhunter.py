@@ -1,151 +1,581 @@
 # tools/bannerhunter.py
+import os
 import socket
+import ssl
+import asyncio
+import ipaddress
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
 import re
 
-from packaging.version import parse as parse_version  # pip install packaging
+from tools.fingerprints import FingerprintDB, DEFAULT_SIGNATURES
+from tools.tlsinspect import make_client_context, inspect_ssl_object
+from tools.resolver import get_resolver, is_ip
 
 DEFAULT_PORTS = [21, 22, 23, 25, 80, 110, 143, 443, 3306, 5432]
 DEFAULT_TIMEOUT = 2.5
 MAX_READ = 1500
 MAX_PORTS = 20
+MAX_ASYNC_PORTS = 65535
+DEFAULT_CONCURRENCY = 200
+SHORT_WAIT = 0.4
+MAX_TARGET_HOSTS = 65536
+MAX_FLEET_ENTRIES = 5000      # open ports kept by a non-streamed fleet scan; the stream has no limit
+MAX_UNRESOLVED_NOTE = 50
+# adaptive timeouts: smoothed connect RTT * factor, clamped to [min, timeout]
+ADAPTIVE_RTT_FACTOR = 4.0
+ADAPTIVE_MIN_TIMEOUT = 0.5
+RTT_SMOOTHING = 0.3
 
-FINGERPRINTS = [
-    (re.compile(r"Apache/?\s*([0-9]+\.[0-9]+\.[0-9]+)"), ("Apache HTTPD", 1, "2.4.49")),
-    (re.compile(r"nginx/?\s*([0-9]+\.[0-9]+(?:\.[0-9]+)?)"), ("nginx", 1, "1.19.0")),
-    (re.compile(r"OpenSSH[_-]?([0-9]+\.[0-9]+(?:p[0-9]+)?)"), ("OpenSSH", 1, "7.6")),
-    (re.compile(r"vsftpd/?\s*([0-9]+\.[0-9]+(?:\.[0-9]+)?)"), ("vsftpd", 1, "3.0.3")),
-    (re.compile(r"Exim\s+([0-9]+\.[0-9]+)"), ("Exim", 1, "4.92")),
-    (re.compile(r"Microsoft-IIS/?\s*([0-9]+\.[0-9]+)"), ("Microsoft IIS", 1, None)),
-    (re.compile(r"Apache-Coyote/([0-9]+\.[0-9]+)"), ("Apache Tomcat (Coyote)", 1, None)),
-    (re.compile(r"mysql.*?Ver\s*([0-9]+\.[0-9]+(?:\.[0-9]+)?)", re.I), ("MySQL", 1, "5.7")),
-    (re.compile(r"PostgreSQL.*?([0-9]+\.[0-9]+(?:\.[0-9]+)?)", re.I), ("PostgreSQL", 1, "9.6")),
-]
+# Protocol probe table, in the spirit of nmap-service-probes.
+#   ports:        ports the probe applies to
+#   server_first: the service greets us, so listen before sending anything
+#   wait:         initial listen window for server-first probes (None = full timeout)
+#   send:         bytes to send (client-first) or fallback nudge (server-first);
+#                 "{host}" is replaced with the target hostname (or its IP)
+#   until:        stop reading once this matches (None = first chunk is enough)
+#   tls:          complete a TLS handshake first and run the probe inside it
+PROBES = {
+    "http": {
+        "ports": (80, 81, 591, 3000, 5000, 8000, 8008, 8080, 8081, 8088, 8888, 9000),
+        "server_first": False,
+        "send": b"HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: BannerHunter\r\n\r\n",
+        "until": re.compile(rb"\r?\n\r?\n"),
+    },
+    "ssh": {
+        "ports": (22, 2222),
+        "server_first": True,
+        "wait": None,
+        "send": b"\r\n",
+        "until": re.compile(rb"\n"),
+    },
+    "ftp": {
+        "ports": (21, 2121),
+        "server_first": True,
+        "wait": None,
+        "send": b"HELP\r\n",
+        "until": re.compile(rb"(?m)^\d{3} [^\r\n]*\r?\n"),
+    },
+    "smtp": {
+        "ports": (25, 587, 2525),
+        "server_first": True,
+        "wait": None,
+        "send": b"EHLO bannerhunter\r\n",
+        "until": re.compile(rb"(?m)^\d{3} [^\r\n]*\r?\n"),
+    },
+    "pop3": {
+        "ports": (110,),
+        "server_first": True,
+        "wait": None,
+        "send": b"CAPA\r\n",
+        "until": re.compile(rb"\r?\n"),
+    },
+    "imap": {
+        "ports": (143,),
+        "server_first": True,
+        "wait": None,
+        "send": b"a1 CAPABILITY\r\n",
+        "until": re.compile(rb"\r?\n"),
+    },
+    "telnet": {
+        "ports": (23,),
+        "server_first": True,
+        "wait": None,
+        "send": b"\r\n",
+        "until": None,
+    },
+    "mysql": {
+        "ports": (3306,),
+        "server_first": True,
+        "wait": None,
+        "send": b"",
+        "until": None,
+    },
+    "redis": {
+        "ports": (6379,),
+        "server_first": False,
+        "send": b"INFO server\r\n",
+        "until": re.compile(rb"redis_version:[^\r\n]*\r?\n|^-[^\r\n]*\r?\n"),
+    },
+    "https": {
+        "ports": (443, 4443, 8443, 9443),
+        "tls": True,
+        "server_first": False,
+        "send": b"HEAD / HTTP/1.0\r\nHost: {host}\r\nUser-Agent: BannerHunter\r\n\r\n",
+        "until": re.compile(rb"\r?\n\r?\n"),
+    },
+    "smtps": {
+        "ports": (465,),
+        "tls": True,
+        "server_first": True,
+        "wait": None,
+        "send": b"EHLO bannerhunter\r\n",
+        "until": re.compile(rb"(?m)^\d{3} [^\r\n]*\r?\n"),
+    },
+    "imaps": {
+        "ports": (993,),
+        "tls": True,
+        "server_first": True,
+        "wait": None,
+        "send": b"a1 CAPABILITY\r\n",
+        "until": re.compile(rb"\r?\n"),
+    },
+    "pop3s": {
+        "ports": (995,),
+        "tls": True,
+        "server_first": True,
+        "wait": None,
+        "send": b"CAPA\r\n",
+        "until": re.compile(rb"\r?\n"),
+    },
+    "ldaps": {
+        "ports": (636,),
+        "tls": True,
+        "server_first": False,
+        "send": b"",
+        "until": None,
+    },
+}
 
+# Unknown ports: listen briefly in case the service greets us, then nudge it.
+GENERIC_PROBE = {
+    "server_first": True,
+    "wait": SHORT_WAIT,
+    "send": b"\r\n",
+    "until": None,
+}
 
-def _sanitize_ports(port_list: Optional[List[int]]) -> List[int]:
+PORT_PROBES = {port: probe for probe in PROBES.values() for port in probe["ports"]}
+
+TLS_CONTEXT = make_client_context()
+
+SIGNATURES_PATH = os.environ.get("BANNERHUNTER_SIGNATURES", DEFAULT_SIGNATURES)
+
+
+_fingerprint_db: Optional[FingerprintDB] = None
+
+
+def get_fingerprint_db() -> FingerprintDB:
+    """Signature database, compiled once per process on first use."""
+    global _fingerprint_db
+    if _fingerprint_db is None:
+        _fingerprint_db = FingerprintDB.load(SIGNATURES_PATH)
+    return _fingerprint_db
+
+
+def _sanitize_ports(port_list: Optional[List[int]], limit: int = MAX_PORTS) -> List[int]:
     if not port_list:
         return DEFAULT_PORTS.copy()
     cleaned = []
+    seen = set()
     for p in port_list:
         try:
             pi = int(p)
-            if 1 <= pi <= 65535:
+            if 1 <= pi <= 65535 and pi not in seen:
+                seen.add(pi)
                 cleaned.append(pi)
         except Exception:
             continue
-        if len(cleaned) >= MAX_PORTS:
+        if len(cleaned) >= limit:
             break
     return cleaned or DEFAULT_PORTS.copy()
 
 
+def parse_ports(spec: str) -> Optional[List[int]]:
+    """
+    Parse a port spec such as "22,80,8000-8100" into a list of ints.
+    Returns None when nothing usable was given.
+    """
+    ports = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if "-" in part:
+                lo, hi = part.split("-", 1)
+                lo, hi = int(lo), int(hi)
+                if lo > hi:
+                    lo, hi = hi, lo
+                ports.extend(range(max(lo, 1), min(hi, 65535) + 1))
+            else:
+                ports.append(int(part))
+        except ValueError:
+            continue
+    return ports or None
+
+
+def expand_targets(specs, limit: int = MAX_TARGET_HOSTS) -> Iterator[str]:
+    """
+    Lazily expand hostnames, IPs and CIDR blocks into single targets.
+    `specs` is a string (comma / whitespace separated) or an iterable of
+    lines such as an uploaded target list; '#' starts a comment.
+    """
+    if isinstance(specs, (str, bytes)):
+        specs = specs.splitlines()
+    count = 0
+    for line in specs:
+        if isinstance(line, bytes):
+            line = line.decode(errors="ignore")
+        line = line.split("#", 1)[0]
+        for item in re.split(r"[\s,;]+", line):
+            if not item:
+                continue
+            if "/" in item:
+                try:
+                    hosts = ipaddress.ip_network(item, strict=False).hosts()
+                except ValueError:
+                    continue
+            else:
+                hosts = (item,)
+            for host in hosts:
+                if count >= limit:
+                    return
+                count += 1
+                yield str(host)
+
+
+class _HostTimeouts:
+    """Per-host timeouts derived from a smoothed connect RTT."""
+
+    def __init__(self, ceiling: float):
+        self.ceiling = ceiling
+        self._srtt: Dict[str, float] = {}
+
+    def get(self, ip: str) -> float:
+        srtt = self._srtt.get(ip)
+        if srtt is None:
+            return self.ceiling
+        return min(self.ceiling, max(ADAPTIVE_MIN_TIMEOUT, srtt * ADAPTIVE_RTT_FACTOR))
+
+    def note(self, ip: str, rtt: float):
+        prev = self._srtt.get(ip)
+        self._srtt[ip] = rtt if prev is None else prev + RTT_SMOOTHING * (rtt - prev)
+
+    def forget(self, ip: str):
+        self._srtt.pop(ip, None)
+
+
 class BannerHunter:
-    def __init__(self, target: str, ports: Optional[List[int]] = None, timeout: float = DEFAULT_TIMEOUT):
+    """
+    Service banner grabber.
+    concurrency > 1 uses the asyncio engine (up to MAX_ASYNC_PORTS ports,
+    at most `concurrency` connections in flight); concurrency <= 1 keeps
+    the original sequential scan capped at MAX_PORTS.
+    """
+
+    def __init__(self, target: str, ports: Optional[List[int]] = None, timeout: float = DEFAULT_TIMEOUT,
+                 concurrency: int = DEFAULT_CONCURRENCY):
         self.target = target.strip()
         self.timeout = float(timeout)
-        self.ports = _sanitize_ports(ports)
+        self.concurrency = max(1, int(concurrency))
+        limit = MAX_ASYNC_PORTS if self.concurrency > 1 else MAX_PORTS
+        self.ports = _sanitize_ports(ports, limit=limit)
 
     def _looks_like_ip(self, s: str) -> bool:
-        try:
-            socket.inet_aton(s)
-            return True
-        except Exception:
-            return False
+        return is_ip(s)
+
+    def _is_fleet(self) -> bool:
+        return bool(re.search(r"[/\s,;]", self.target))
 
     def resolve(self) -> Dict[str, Any]:
-        if self._looks_like_ip(self.target):
-            return {"hostname": self.target, "ips": [self.target], "aliases": []}
+        """A + AAAA lookup through the shared, TTL-cached resolver."""
+        return get_resolver().resolve(self.target)
+
+    def _probe_for(self, port: int) -> Dict[str, Any]:
+        return PORT_PROBES.get(port, GENERIC_PROBE)
+
+    def _probe_payload(self, probe: Dict[str, Any], ip: str, server_name: Optional[str] = None) -> bytes:
+        """The probe's bytes with "{host}" set to this target's hostname, or its IP."""
+        name = self._server_name(server_name)
+        host = b""
+        if name:
+            try:
+                host = name.encode("idna")
+            except UnicodeError:
+                host = name.encode("ascii", errors="ignore")
+        if not host:
+            host = (f"[{ip}]" if ":" in ip else ip).encode("ascii")
+        return probe.get("send", b"").replace(b"{host}", host)
+
+    def _initial_wait(self, probe: Dict[str, Any], timeout: Optional[float] = None) -> float:
+        timeout = self.timeout if timeout is None else timeout
+        wait = probe.get("wait")
+        return timeout if wait is None else min(wait, timeout)
+
+    def _read_response(self, s: socket.socket, until, first_wait: float) -> bytes:
+        """
+        Read until the probe's terminator matches, the peer closes, MAX_READ is
+        reached or the timeout expires. Only the first read uses `first_wait`.
+        """
+        buf = b""
+        s.settimeout(first_wait)
+        while len(buf) < MAX_READ:
+            try:
+                chunk = s.recv(MAX_READ - len(buf))
+            except Exception:
+                break
+            if not chunk:
+                break
+            buf += chunk
+            if until is None or until.search(buf):
+                break
+            s.settimeout(self.timeout)
+        return buf
+
+    def _server_name(self, name: Optional[str] = None) -> Optional[str]:
+        """SNI for TLS probes: the scanned hostname, never an IP or a fleet spec."""
+        name = name if name is not None else self.target
+        if not name or self._looks_like_ip(name) or re.search(r"[/\s,;:]", name):
+            return None
+        return name
+
+    def grab_banner(self, ip: str, port: int, server_name: Optional[str] = None) -> Dict[str, Any]:
+        res = self._empty_entry(ip, port)
+        probe = self._probe_for(port)
         try:
-            hostname, aliases, ips = socket.gethostbyname_ex(self.target)
-            return {"hostname": hostname, "aliases": aliases, "ips": ips}
+            with socket.create_connection((ip, port), timeout=self.timeout) as s:
+                if probe.get("tls"):
+                    try:
+                        s = TLS_CONTEXT.wrap_socket(s, server_hostname=self._server_name(server_name))
+                    except ssl.SSLError as e:
+                        res["error"] = f"TLS handshake failed: {e}"
+                        return res
+                    with s:
+                        res["tls"] = inspect_ssl_object(s)
+                        return self._finish_entry(res, self._exchange(s, probe, ip, server_name))
+
+                return self._finish_entry(res, self._exchange(s, probe, ip, server_name))
+
         except Exception as e:
-            return {"error": f"DNS resolution failed: {e}"}
+            res["error"] = str(e)
+            return res
 
-    def _gentle_probe(self, s: socket.socket, port: int):
-        try:
-            if port in (80, 8080, 8000, 8888):
-                s.sendall(b"HEAD / HTTP/1.0\r\nHost: example\r\n\r\n")
-            elif port in (25, 587, 110, 143):
-                s.sendall(b"\r\n")
-            else:
-                s.sendall(b"\r\n")
-        except Exception:
-            pass
+    def _exchange(self, s: socket.socket, probe: Dict[str, Any], ip: str, server_name: Optional[str] = None) -> bytes:
+        data = b""
+        if probe["server_first"]:
+            data = self._read_response(s, probe["until"], self._initial_wait(probe))
 
-    def grab_banner(self, ip: str, port: int) -> Dict[str, Any]:
-        res = {"ip": ip, "port": port, "success": False, "raw": "", "product": None, "version": None, "risk": "unknown", "error": None}
+        payload = self._probe_payload(probe, ip, server_name)
+        if not data and payload:
+            try:
+                s.sendall(payload)
+                data = self._read_response(s, probe["until"], self.timeout)
+            except Exception:
+                data = b""
+        return data
+
+    def _empty_entry(self, ip: str, port: int) -> Dict[str, Any]:
+        return {"ip": ip, "port": port, "success": False, "raw": "", "product": None, "version": None, "risk": "unknown", "error": None, "tls": None}
+
+    def _finish_entry(self, res: Dict[str, Any], data: bytes) -> Dict[str, Any]:
+        raw = data.decode(errors="replace").strip() if data else ""
+        res["raw"] = raw
+        res["success"] = True
+        if raw:
+            res["product"], res["version"], res["risk"] = self._fingerprint(raw)
+        return res
+
+    async def _read_response_async(self, reader: asyncio.StreamReader, until, first_wait: float,
+                                   timeout: float) -> bytes:
+        buf = b""
+        wait = first_wait
+        while len(buf) < MAX_READ:
+            try:
+                chunk = await asyncio.wait_for(reader.read(MAX_READ - len(buf)), wait)
+            except Exception:
+                break
+            if not chunk:
+                break
+            buf += chunk
+            if until is None or until.search(buf):
+                break
+            wait = timeout
+        return buf
+
+    async def grab_banner_async(self, ip: str, port: int, timeouts: Optional[_HostTimeouts] = None,
+                                server_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        asyncio twin of grab_banner(); returns the same entry dict.
+        With `timeouts`, the host's RTT-derived timeout replaces self.timeout
+        and the connect RTT measured here feeds back into it.
+        """
+        res = self._empty_entry(ip, port)
+        probe = self._probe_for(port)
+        timeout = timeouts.get(ip) if timeouts else self.timeout
+        loop = asyncio.get_running_loop()
+        writer = None
+        tls_kwargs = {}
+        if probe.get("tls"):
+            tls_kwargs = {"ssl": TLS_CONTEXT, "server_hostname": self._server_name(server_name) or ""}
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(self.timeout)
-                s.connect((ip, port))
+            started = loop.time()
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port, **tls_kwargs), timeout)
+            except ssl.SSLError as e:
+                res["error"] = f"TLS handshake failed: {e}"
+                return res
+            except ConnectionRefusedError:
+                # an RST is as good an RTT sample as a SYN/ACK
+                if timeouts:
+                    timeouts.note(ip, loop.time() - started)
+                raise
+            if timeouts:
+                timeouts.note(ip, loop.time() - started)
+            ssl_obj = writer.get_extra_info("ssl_object")
+            if ssl_obj is not None:
+                res["tls"] = inspect_ssl_object(ssl_obj)
 
+            data = b""
+            if probe["server_first"]:
+                data = await self._read_response_async(reader, probe["until"], self._initial_wait(probe, timeout), timeout)
+
+            payload = self._probe_payload(probe, ip, server_name)
+            if not data and payload:
                 try:
-                    data = s.recv(MAX_READ)
-                except socket.timeout:
-                    data = b""
+                    writer.write(payload)
+                    await writer.drain()
+                    data = await self._read_response_async(reader, probe["until"], timeout, timeout)
                 except Exception:
                     data = b""
 
-                if not data:
-                    try:
-                        self._gentle_probe(s, port)
-                        data = s.recv(MAX_READ)
-                    except Exception:
-                        data = b""
-
-                raw = data.decode(errors="replace").strip() if data else ""
-                res["raw"] = raw
-                res["success"] = True
-
-                if raw:
-                    product, version, risk = self._fingerprint(raw)
-                    res["product"] = product
-                    res["version"] = version
-                    res["risk"] = risk
-                else:
-                    res["product"] = None
-                    res["version"] = None
-                    res["risk"] = "unknown"
-
-                return res
+            return self._finish_entry(res, data)
 
+        except asyncio.TimeoutError:
+            res["error"] = "timed out"
+            return res
         except Exception as e:
             res["error"] = str(e)
             return res
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except Exception:
+                    pass
 
     def _fingerprint(self, banner: str):
-        banner_clean = banner.strip()
-        for patt, (product_name, ver_group, threshold) in FINGERPRINTS:
-            m = patt.search(banner_clean)
-            if m:
+        return get_fingerprint_db().match(banner)
+
+    async def _scan_ips_async(self, ip_list: List[str], progress=None, stop=None) -> List[Dict[str, Any]]:
+        total = len(ip_list) * len(self.ports)
+        # `concurrency` workers share one lazy iterator, so only that many probes exist at once
+        probes = enumerate((ip, port) for ip in ip_list for port in self.ports)
+        entries: Dict[int, Dict[str, Any]] = {}
+
+        async def _worker():
+            for i, (ip, port) in probes:
+                if stop is not None and stop.is_set():
+                    return
+                entries[i] = await self.grab_banner_async(ip, port)
+                if progress:
+                    progress(len(entries), total)
+
+        await asyncio.gather(*(_worker() for _ in range(min(self.concurrency, total))))
+        # ip-major / port-minor, exactly like the sequential scan
+        return [entries[i] for i in sorted(entries)]
+
+    async def iter_scan_async(self, targets=None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream entries for every target (hostnames, IPs, CIDR blocks; see
+        expand_targets) in completion order. At most `concurrency` probes are
+        in flight and nothing is kept once yielded, so memory stays flat no
+        matter how large the range. Entries carry an extra "target" key;
+        names that do not resolve yield one {"target", "note", "dns"} record.
+        """
+        resolver = get_resolver()
+        timeouts = _HostTimeouts(self.timeout)
+        outstanding: Dict[str, int] = {}
+        pending = set()
+
+        async def _probe(target, ip, port):
+            try:
+                e = await self.grab_banner_async(ip, port, timeouts, server_name=target)
+            finally:
+                outstanding[ip] -= 1
+                if not outstanding[ip]:
+                    del outstanding[ip]
+                    timeouts.forget(ip)
+            e["target"] = target
+            return e
+
+        try:
+            for target in expand_targets(self.target if targets is None else targets):
+                resolved = await resolver.resolve_async(target)
+                if not resolved.get("ips"):
+                    yield {"target": target, "note": "no-resolvable-ip", "dns": resolved}
+                    continue
+                for ip in resolved["ips"]:
+                    for port in self.ports:
+                        while len(pending) >= self.concurrency:
+                            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                            for task in done:
+                                yield task.result()
+                        outstanding[ip] = outstanding.get(ip, 0) + 1
+                        pending.add(asyncio.ensure_future(_probe(target, ip, port)))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def iter_scan(self, targets=None) -> Iterator[Dict[str, Any]]:
+        """Blocking generator over iter_scan_async(), e.g. for a streamed Flask response."""
+        loop = asyncio.new_event_loop()
+        agen = self.iter_scan_async(targets)
+        try:
+            while True:
                 try:
-                    version_raw = m.group(ver_group)
-                except Exception:
-                    try:
-                        version_raw = m.group(1)
-                    except Exception:
-                        version_raw = None
-                if version_raw:
-                    ver_norm = re.sub(r"[^0-9\.]", "", version_raw)
-                    risk = "unknown"
-                    if threshold:
-                        try:
-                            if parse_version(ver_norm) <= parse_version(str(threshold)):
-                                risk = "potentially_outdated"
-                            else:
-                                risk = "ok"
-                        except Exception:
-                            risk = "unknown"
-                    else:
-                        risk = "unknown"
-                    return product_name, ver_norm, risk
-                else:
-                    return product_name, None, "unknown"
-        return None, None, "unknown"
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
 
-    def scan(self) -> Dict[str, Any]:
+    def scan(self, progress=None, stop=None) -> Dict[str, Any]:
+        """
+        Full scan result for the template. progress(done, total) is called as
+        probes finish; setting the `stop` event ends the scan early with the
+        entries gathered so far.
+        """
         out = {"target": self.target, "scanned_at": datetime.utcnow().isoformat() + "Z", "dns": None, "entries": []}
+        if self._is_fleet():
+            # only open ports are kept (up to MAX_FLEET_ENTRIES); the NDJSON stream has every probe
+            probed = closed = dropped = 0
+            unresolved = []
+            for e in self.iter_scan():
+                if stop is not None and stop.is_set():
+                    break
+                probed += 1
+                if progress:
+                    progress(probed)
+                if "port" not in e:
+                    if len(unresolved) < MAX_UNRESOLVED_NOTE:
+                        unresolved.append(e["target"])
+                elif not e["success"]:
+                    closed += 1
+                elif len(out["entries"]) < MAX_FLEET_ENTRIES:
+                    out["entries"].append(e)
+                else:
+                    dropped += 1
+            out["entries"].sort(key=lambda e: (e["target"], e["ip"], e["port"]))
+            notes = [f"{probed} probes, {closed} closed or unreachable (not listed)"]
+            if dropped:
+                notes.append(f"{dropped} more open ports over the {MAX_FLEET_ENTRIES}-entry limit; "
+                             "use the streamed fleet scan to see every result")
+            if unresolved:
+                notes.append("unresolved: " + ", ".join(unresolved))
+            out["note"] = "; ".join(notes)
+            return out
+
         resolved = self.resolve()
         out["dns"] = resolved
         ip_list = []
@@ -158,9 +588,18 @@ class BannerHunter:
             out["note"] = "no-resolvable-ip"
             return out
 
+        if self.concurrency > 1:
+            out["entries"] = list(asyncio.run(self._scan_ips_async(ip_list, progress, stop)))
+            return out
+
+        total = len(ip_list) * len(self.ports)
         for ip in ip_list:
             for port in self.ports:
+                if stop is not None and stop.is_set():
+                    return out
                 e = self.grab_banner(ip, port)
                 out["entries"].append(e)
+                if progress:
+                    progress(len(out["entries"]), total)
 
         return out
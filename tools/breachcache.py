@@ -0,0 +1,84 @@
+# tools/breachcache.py
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+DEFAULT_PATH = os.environ.get("HIBP_CACHE_PATH", os.path.join(tempfile.gettempdir(), "cybersentinel_hibp.sqlite3"))
+DEFAULT_TTL = int(os.environ.get("HIBP_CACHE_TTL", 24 * 3600))
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+class BreachCache:
+    """
+    On-disk (SQLite) cache of HIBP results keyed by normalized email.
+    Entries older than `ttl` seconds are treated as missing and purged lazily.
+    Safe to share between Flask worker threads.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: int = DEFAULT_TTL):
+        self.path = path
+        self.ttl = int(ttl)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS breaches ("
+            " email TEXT PRIMARY KEY,"
+            " fetched_at REAL NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        key = normalize_email(email)
+        with self._lock:
+            row = self._conn.execute("SELECT fetched_at, payload FROM breaches WHERE email = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        fetched_at, payload = row
+        if time.time() - fetched_at > self.ttl:
+            self.delete(key)
+            return None
+        result = json.loads(payload)
+        result["cached_at"] = fetched_at
+        return result
+
+    def put(self, email: str, result: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO breaches (email, fetched_at, payload) VALUES (?, ?, ?)",
+                (normalize_email(email), time.time(), json.dumps(result)),
+            )
+
+    def delete(self, email: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM breaches WHERE email = ?", (normalize_email(email),))
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM breaches WHERE fetched_at < ?", (time.time() - self.ttl,))
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[BreachCache] = None
+_default_lock = threading.Lock()
+
+
+def get_breach_cache() -> BreachCache:
+    """Process-wide cache at HIBP_CACHE_PATH with HIBP_CACHE_TTL seconds of freshness."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = BreachCache()
+        return _default_cache
@@ -1,8 +1,23 @@
 # tools/crawleye.py
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 from urllib.parse import urljoin, urlparse
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from html.parser import HTMLParser
+import xml.etree.ElementTree as ET
+import codecs
+import os
+import threading
+import time
+import uuid
+import zlib
+
+from tools.crawlstate import CrawlState, purge_stale
+from tools.resolver import get_resolver
 
 COMMON_SENSITIVE_PATHS = [
     "/admin",
@@ -18,102 +33,546 @@ COMMON_SENSITIVE_PATHS = [
     "/uploads",
 ]
 
+DEFAULT_WORKERS = 4
+# politeness: concurrent requests per host and minimum gap between request starts
+HOST_MAX_CONCURRENCY = 4
+HOST_MIN_INTERVAL = 0.0
+PAGE_TIMEOUT = 5
+# link extraction reads at most this much of each page, in CHUNK_SIZE pieces
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+# sitemaps
+MAX_SITEMAPS = 50
+MAX_SITEMAP_DEPTH = 3
+MAX_SITEMAP_URLS = 100000
+SITEMAP_DISPLAY_LIMIT = 1000
+URL_DISPLAY_LIMIT = 5000
+
+# path discovery
+DISCOVERY_WORKERS = 16
+DISCOVERY_TIMEOUT = 4
+MAX_WORDLIST = 100000
+INTERESTING_STATUS = (200, 401, 403)
+# soft-404 matching: allowed size drift per character of reflected path, plus slack
+REFLECT_BYTES_PER_CHAR = 2
+SIZE_TOLERANCE = 16
+
+
+class _LinkExtractor(HTMLParser):
+    """Incremental <a href> collector: fed chunk by chunk, never builds a tree."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href" and value is not None:
+                    self.hrefs.append(value)
+                    break
+
+
+def extract_links(response, max_bytes=MAX_PAGE_BYTES):
+    """
+    hrefs from a streamed (stream=True) response, reading at most max_bytes.
+    Non-HTML responses are not read at all.
+    """
+    ctype = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if ctype and ctype not in HTML_TYPES:
+        return []
+
+    try:
+        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = _LinkExtractor()
+    read = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if read + len(chunk) > max_bytes:
+            chunk = chunk[:max_bytes - read]
+        read += len(chunk)
+        parser.feed(decoder.decode(chunk))
+        if read >= max_bytes:
+            break
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return parser.hrefs
+
+
+class _CachedDNSMixin:
+    """
+    Connect to the addresses from the shared, TTL-cached resolver (IPv4 and
+    IPv6, tried in order) instead of a fresh getaddrinfo per connection.
+    TLS still uses the hostname for SNI and certificate checks. Names the
+    resolver cannot answer fall back to the normal lookup.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        ips = get_resolver().resolve(host).get("ips") or []
+        error = None
+        for ip in ips:
+            self._dns_host = ip
+            try:
+                return super()._new_conn()
+            except (NewConnectionError, ConnectTimeoutError) as e:
+                error = e
+            finally:
+                self._dns_host = host
+        if error is not None:
+            raise error
+        return super()._new_conn()
+
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _CachedDNSHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _CachedDNSHTTPConnection
+
+
+class _CachedDNSHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedDNSHTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections resolve through tools.resolver's cache."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _CachedDNSHTTPPool, "https": _CachedDNSHTTPSPool}
+
+
+class _HostLimiter:
+    """Caps concurrent requests per host and spaces their start times."""
+
+    def __init__(self, max_concurrency: int, min_interval: float):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_interval = float(min_interval)
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next_start = {}
+
+    def acquire(self, host: str):
+        with self._lock:
+            sem = self._slots.get(host)
+            if sem is None:
+                sem = self._slots[host] = threading.BoundedSemaphore(self.max_concurrency)
+        sem.acquire()
+        if self.min_interval > 0:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, 0.0))
+                self._next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+
+    def release(self, host: str):
+        self._slots[host].release()
+
+
+def load_wordlist(source, limit=MAX_WORDLIST):
+    """
+    Paths from a wordlist file (path) or any iterable of lines. Blank lines
+    and '#' comments are skipped; a leading '/' is added where missing.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8", errors="ignore") as f:
+            yield from load_wordlist(f, limit)
+        return
+    count = 0
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="ignore")
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield line if line.startswith("/") else "/" + line
+        count += 1
+        if count >= limit:
+            return
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_sitemap(chunks):
+    """
+    Stream (kind, url) pairs out of a sitemap or sitemap index fed as byte
+    chunks, where kind is "url" or "sitemap". Gzip is detected by magic bytes
+    and inflated on the fly; elements are cleared as soon as they are read,
+    so memory does not grow with the number of entries.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    inflate = None
+    root = None
+    first = True
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if first:
+            first = False
+            if chunk[:2] == b"\x1f\x8b":
+                inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parser.feed(inflate.decompress(chunk) if inflate else chunk)
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+            name = _local(elem.tag)
+            if name in ("url", "sitemap"):
+                for child in elem:
+                    if _local(child.tag) == "loc" and child.text:
+                        yield name, child.text.strip()
+                        break
+                elem.clear()
+                root.clear()
+
 
 class CrawlEye:
-    def __init__(self, base_url, max_pages=50):
+    """
+    Same-domain crawler. Pages are fetched by `workers` threads over one
+    keep-alive pool; each URL is queued at most once (seen-set checked at
+    enqueue time) and no more than `max_pages` pages are ever fetched
+    successfully.
+
+    Frontier, visited fingerprints and crawled pages live in a CrawlState
+    on disk, checkpointed after every batch of fetches. A crawl that dies
+    part-way keeps its state; passing the same crawl_id resumes it.
+    Finished crawls delete their state.
+    """
+
+    def __init__(self, base_url, max_pages=50, workers=DEFAULT_WORKERS,
+                 host_concurrency=HOST_MAX_CONCURRENCY, host_interval=HOST_MIN_INTERVAL, wordlist=None,
+                 crawl_id=None):
         if not base_url.startswith("http"):
             base_url = "http://" + base_url
 
         self.base_url = base_url.rstrip("/")
         self.domain = urlparse(self.base_url).netloc
         self.max_pages = max_pages
+        self.workers = max(1, int(workers))
+        # paths for check_sensitive_paths(): file path or list; defaults to COMMON_SENSITIVE_PATHS
+        self.wordlist = wordlist or os.environ.get("CRAWLEYE_WORDLIST") or None
+
+        # one keep-alive pool per crawl: TCP/TLS setup happens per connection,
+        # not per GET, and connections take their addresses from the DNS cache
+        self.session = requests.Session()
+        adapter = CachedDNSAdapter(pool_connections=4, pool_maxsize=max(self.workers, DISCOVERY_WORKERS))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiter = _HostLimiter(host_concurrency, host_interval)
+        self.dns = None
 
-        self.visited = set()
-        self.queue = deque([self.base_url])
-        self.discovered = set()
+        self.crawl_id = crawl_id or uuid.uuid4().hex
+        self.state = None
 
         self.robots_paths = []
+        self.robots_sitemaps = []
         self.sitemap_urls = []
+        self.sitemap_count = 0
         self.sensitive_hits = []
 
     # ================= ROBOTS.TXT =================
     def parse_robots(self):
         robots_url = urljoin(self.base_url, "/robots.txt")
         try:
-            r = requests.get(robots_url, timeout=5)
+            r = self.session.get(robots_url, timeout=5)
             if r.status_code == 200:
                 for line in r.text.splitlines():
                     if line.lower().startswith("disallow"):
                         path = line.split(":")[1].strip()
                         if path:
                             self.robots_paths.append(path)
+                    elif line.lower().startswith("sitemap"):
+                        url = line.split(":", 1)[1].strip()
+                        if url:
+                            self.robots_sitemaps.append(urljoin(self.base_url, url))
         except Exception:
             pass
 
     # ================= SITEMAP.XML =================
     def parse_sitemap(self):
-        sitemap_url = urljoin(self.base_url, "/sitemap.xml")
+        """
+        Walk /sitemap.xml and every Sitemap: listed in robots.txt, following
+        sitemap indexes (up to MAX_SITEMAP_DEPTH levels, MAX_SITEMAPS files).
+        Same-domain page URLs go straight into the crawl frontier; the first
+        SITEMAP_DISPLAY_LIMIT are kept for the report.
+        """
+        pending = deque((u, 0) for u in self.robots_sitemaps + [urljoin(self.base_url, "/sitemap.xml")])
+        fetched = set()
+        while pending and len(fetched) < MAX_SITEMAPS and self.sitemap_count < MAX_SITEMAP_URLS:
+            sitemap_url, depth = pending.popleft()
+            if sitemap_url in fetched:
+                continue
+            fetched.add(sitemap_url)
+            try:
+                with self.session.get(sitemap_url, timeout=5, stream=True) as r:
+                    if r.status_code != 200:
+                        continue
+                    for kind, loc in iter_sitemap(r.iter_content(CHUNK_SIZE)):
+                        if kind == "sitemap":
+                            if depth < MAX_SITEMAP_DEPTH:
+                                pending.append((urljoin(sitemap_url, loc), depth + 1))
+                            continue
+                        self._add_sitemap_url(loc)
+                        if self.sitemap_count >= MAX_SITEMAP_URLS:
+                            break
+            except Exception:
+                continue
+
+    def _add_sitemap_url(self, loc):
+        self.sitemap_count += 1
+        if len(self.sitemap_urls) < SITEMAP_DISPLAY_LIMIT:
+            self.sitemap_urls.append(loc)
+        parsed = urlparse(loc)
+        if parsed.netloc == self.domain:
+            self._enqueue(parsed.scheme + "://" + parsed.netloc + parsed.path)
+
+    # ================= SENSITIVE PATHS =================
+    def _probe_path(self, path, method):
+        """
+        Status / size / type / Location for a path without downloading it:
+        HEAD, or a GET for bytes=0-0 whose Content-Range carries the full size.
+        """
+        url = self.base_url + path
+        host = urlparse(url).netloc
+        self.limiter.acquire(host)
         try:
-            r = requests.get(sitemap_url, timeout=5)
-            if r.status_code == 200 and "<urlset" in r.text:
-                soup = BeautifulSoup(r.text, "xml")
-                for loc in soup.find_all("loc"):
-                    self.sitemap_urls.append(loc.text.strip())
+            if method == "HEAD":
+                r = self.session.head(url, timeout=DISCOVERY_TIMEOUT, allow_redirects=False)
+            else:
+                r = self.session.get(url, timeout=DISCOVERY_TIMEOUT, allow_redirects=False,
+                                     headers={"Range": "bytes=0-0"}, stream=True)
+            r.close()
         except Exception:
-            pass
+            return None
+        finally:
+            self.limiter.release(host)
 
-    # ================= SENSITIVE PATHS =================
-    def check_sensitive_paths(self):
-        for path in COMMON_SENSITIVE_PATHS:
-            full = self.base_url + path
-            try:
-                r = requests.get(full, timeout=4)
-                if r.status_code in (200, 401, 403):
-                    self.sensitive_hits.append({
-                        "path": path,
-                        "status": r.status_code
-                    })
-            except Exception:
-                pass
+        status = 200 if r.status_code == 206 else r.status_code
+        length = None
+        crange = r.headers.get("Content-Range", "")
+        if "/" in crange and crange.rsplit("/", 1)[1].strip().isdigit():
+            length = int(crange.rsplit("/", 1)[1])
+        elif r.headers.get("Content-Length", "").isdigit() and r.status_code != 206:
+            length = int(r.headers["Content-Length"])
+        location = r.headers.get("Location", "").replace(path, "{path}")
+        return {
+            "path": path,
+            "status": status,
+            "length": length,
+            "type": r.headers.get("Content-Type", "").split(";")[0].strip().lower(),
+            "location": location,
+        }
 
-    # ================= PAGE CRAWLING =================
-    def crawl(self):
-        self.parse_robots()
-        self.parse_sitemap()
-        self.check_sensitive_paths()
-
-        while self.queue and len(self.visited) < self.max_pages:
-            current = self.queue.popleft()
-            if current in self.visited:
-                continue
+    def _soft404_baseline(self, method):
+        """Probe random paths of different lengths to learn the site's 'not found' response."""
+        baseline = []
+        for size in (8, 24):
+            fp = self._probe_path("/" + uuid.uuid4().hex[:size], method)
+            if fp is not None:
+                baseline.append(fp)
+        return baseline
 
-            try:
-                r = requests.get(current, timeout=5)
-                if r.status_code != 200:
-                    continue
-            except Exception:
+    def _is_soft404(self, fp, baseline):
+        for base in baseline:
+            if fp["status"] != base["status"] or fp["type"] != base["type"]:
+                continue
+            if fp["status"] in (301, 302, 303, 307, 308):
+                if fp["location"] == base["location"]:
+                    return True
                 continue
+            if fp["length"] is None or base["length"] is None:
+                if fp["length"] == base["length"]:
+                    return True
+                continue
+            drift = abs(len(fp["path"]) - len(base["path"])) * REFLECT_BYTES_PER_CHAR + SIZE_TOLERANCE
+            if abs(fp["length"] - base["length"]) <= drift:
+                return True
+        return False
 
-            self.visited.add(current)
-            self.discovered.add(current)
+    def discover_paths(self, paths, workers=DISCOVERY_WORKERS):
+        """
+        Probe many paths concurrently (HEAD, falling back to zero-length range
+        GETs where HEAD is refused) and return hits whose status is in
+        INTERESTING_STATUS and that do not look like the site's soft-404 page.
+        """
+        method = "HEAD"
+        baseline = self._soft404_baseline(method)
+        if not baseline or any(b["status"] in (405, 501) for b in baseline):
+            method = "RANGE"
+            baseline = self._soft404_baseline(method)
 
-            soup = BeautifulSoup(r.text, "html.parser")
+        hits = []
+        paths = iter(paths)
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as pool:
+            while True:
+                for path in paths:
+                    in_flight.add(pool.submit(self._probe_path, path, method))
+                    if len(in_flight) >= workers * 4:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    fp = fut.result()
+                    if fp and fp["status"] in INTERESTING_STATUS and not self._is_soft404(fp, baseline):
+                        hits.append({"path": fp["path"], "status": fp["status"], "length": fp["length"]})
+        hits.sort(key=lambda h: h["path"])
+        return hits
 
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                url = urljoin(current, href)
-                parsed = urlparse(url)
+    def check_sensitive_paths(self):
+        if self.wordlist:
+            paths = load_wordlist(self.wordlist)
+        else:
+            paths = COMMON_SENSITIVE_PATHS
+        self.sensitive_hits.extend(self.discover_paths(paths))
 
-                if parsed.netloc == self.domain:
-                    clean = parsed.scheme + "://" + parsed.netloc + parsed.path
-                    if clean not in self.visited:
-                        self.queue.append(clean)
+    # ================= PAGE CRAWLING =================
+    def resolve(self):
+        """A/AAAA of the target; the same cached answer is what the session connects to."""
+        hostname = urlparse(self.base_url).hostname or ""
+        self.dns = get_resolver().resolve(hostname)
+        return self.dns
 
+    def _result(self):
         return {
             "base_url": self.base_url,
-            "total_pages": len(self.discovered),
-            "urls": sorted(self.discovered),
+            "crawl_id": self.crawl_id,
+            "dns": self.dns,
+            "total_pages": self.state.visited_count if self.state else 0,
+            "urls": list(self.state.pages(URL_DISPLAY_LIMIT)) if self.state else [],
             "robots": sorted(set(self.robots_paths)),
             "sitemap": sorted(set(self.sitemap_urls)),
+            "sitemap_total": self.sitemap_count,
             "sensitive": self.sensitive_hits
         }
+
+    def _enqueue(self, url):
+        self.state.add(url)
+
+    _PREAMBLE = ("robots_paths", "robots_sitemaps", "sitemap_urls", "sitemap_count", "sensitive_hits")
+
+    def _open_state(self):
+        """Open (or resume) this crawl's state. True if a checkpoint was found."""
+        self.state = CrawlState(self.crawl_id)
+        saved_base = self.state.get_meta("base_url")
+        if saved_base is None:
+            return False
+        if saved_base != self.base_url:
+            self.state.close()
+            raise ValueError(f"crawl {self.crawl_id} belongs to {saved_base}, not {self.base_url}")
+        for name, value in self.state.get_meta("preamble", {}).items():
+            setattr(self, name, value)
+        return True
+
+    def _preamble(self):
+        """robots.txt, sitemaps and path discovery, committed as one checkpoint."""
+        with self.state.batch():
+            self._enqueue(self.base_url)
+            self.parse_robots()
+            self.parse_sitemap()
+            self.check_sensitive_paths()
+            self.state.set_meta("preamble", {name: getattr(self, name) for name in self._PREAMBLE})
+            self.state.set_meta("base_url", self.base_url)
+
+    def _fetch_links(self, current):
+        """
+        Fetch one page; same-domain links on it, or None if it was not a 200.
+        The body is streamed through extract_links(), so non-HTML responses
+        are never downloaded and HTML is capped at MAX_PAGE_BYTES.
+        """
+        host = urlparse(current).netloc
+        self.limiter.acquire(host)
+        try:
+            with self.session.get(current, timeout=PAGE_TIMEOUT, stream=True) as r:
+                if r.status_code != 200:
+                    return None
+                hrefs = extract_links(r)
+        except Exception:
+            return None
+        finally:
+            self.limiter.release(host)
+
+        links = []
+        for href in hrefs:
+            try:
+                parsed = urlparse(urljoin(current, href))
+            except ValueError:
+                continue
+
+            if parsed.netloc == self.domain:
+                links.append(parsed.scheme + "://" + parsed.netloc + parsed.path)
+        return links
+
+    def crawl(self, progress=None, stop=None):
+        """
+        Run (or resume) the crawl. progress(pages, max_pages, message) reports
+        progress; setting the `stop` event ends the crawl early and keeps its
+        checkpoint so the same crawl_id can pick it up later.
+        """
+        self.resolve()
+        purge_stale()
+        resumed = self._open_state()
+        try:
+            if not resumed:
+                if progress:
+                    progress(0, self.max_pages, "robots.txt, sitemaps and path discovery")
+                self._preamble()
+            self._crawl_frontier(progress, stop)
+        except BaseException:
+            # keep the checkpoint so the crawl can be resumed by crawl_id
+            self.state.close()
+            raise
+
+        result = self._result()
+        if stop is not None and stop.is_set():
+            result["note"] = f"Stopped early; resume with crawl ID {self.crawl_id}"
+            self.state.close()
+            return result
+        if resumed:
+            result["note"] = f"Resumed crawl {self.crawl_id}"
+        elif not result["total_pages"] and self.dns.get("error"):
+            result["note"] = self.dns["error"]
+        self.state.discard()
+        return result
+
+    def _crawl_frontier(self, progress=None, stop=None):
+        state = self.state
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                # reserve a page slot per request so max_pages is never overshot;
+                # failed fetches hand their slot back. Once stopped, only drain
+                # in-flight fetches so their pages are checkpointed.
+                free = min(self.workers - len(in_flight), self.max_pages - state.visited_count - len(in_flight))
+                if stop is not None and stop.is_set():
+                    free = 0
+                if free > 0:
+                    for entry_id, url in state.pop(free):
+                        in_flight[pool.submit(self._fetch_links, url)] = (entry_id, url)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                with state.batch():
+                    for fut in done:
+                        entry_id, current = in_flight.pop(fut)
+                        links = fut.result()
+                        state.done(entry_id, current, links is not None)
+                        for link in links or ():
+                            self._enqueue(link)
+                if progress:
+                    progress(state.visited_count, self.max_pages, "crawling")
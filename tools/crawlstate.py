@@ -0,0 +1,166 @@
+# tools/crawlstate.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Tuple
+
+STATE_DIR = os.environ.get("CRAWL_STATE_DIR", os.path.join(tempfile.gettempdir(), "cybersentinel_crawls"))
+STATE_TTL = int(os.environ.get("CRAWL_STATE_TTL", 7 * 24 * 3600))
+CACHE_KIB = 4096   # SQLite page cache per crawl; bounds RSS regardless of crawl size
+
+_CRAWL_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def fingerprint(url: str) -> int:
+    """Signed 64-bit fingerprint of a URL (fits an SQLite INTEGER key)."""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8", "surrogatepass"), digest_size=8).digest(),
+                          "big", signed=True)
+
+
+def valid_crawl_id(crawl_id: str) -> bool:
+    return bool(crawl_id and _CRAWL_ID.match(crawl_id))
+
+
+class CrawlState:
+    """
+    Disk-backed crawl state for one crawl ID: a FIFO frontier, a visited set
+    of 64-bit URL fingerprints, the crawled page list and a JSON metadata
+    blob. Every write goes to SQLite, so a crawl killed mid-way can be
+    reopened with the same ID and continues where the last commit left off.
+
+    URLs handed out by pop() are leased; they only leave the frontier via
+    done(), and reopening a crawl releases leases held by the dead process.
+    """
+
+    def __init__(self, crawl_id: str, state_dir: str = STATE_DIR):
+        if not valid_crawl_id(crawl_id):
+            raise ValueError(f"invalid crawl ID: {crawl_id!r}")
+        os.makedirs(state_dir, exist_ok=True)
+        self.crawl_id = crawl_id
+        self.path = os.path.join(state_dir, crawl_id + ".sqlite3")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA cache_size=-{CACHE_KIB}")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS seen (fp INTEGER PRIMARY KEY) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, leased INTEGER NOT NULL DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS frontier_leased ON frontier (leased, id);"
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT NOT NULL);"
+        )
+        self._conn.execute("UPDATE frontier SET leased = 0 WHERE leased = 1")
+        self._depth = 0
+        self._uncommitted = 0      # pages recorded in the open batch
+        self.visited_count = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    # ---------------- transactions ----------------
+    @contextmanager
+    def batch(self):
+        """Group writes into one transaction (one checkpoint); nests."""
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                    self._uncommitted = 0
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+                self.visited_count += self._uncommitted
+                self._uncommitted = 0
+
+    # ---------------- metadata ----------------
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    # ---------------- frontier / visited ----------------
+    def add(self, url: str) -> bool:
+        """Queue url unless it was ever queued before. True if newly queued."""
+        with self._lock:
+            cur = self._conn.execute("INSERT OR IGNORE INTO seen (fp) VALUES (?)", (fingerprint(url),))
+            if cur.rowcount != 1:
+                return False
+            self._conn.execute("INSERT INTO frontier (url) VALUES (?)", (url,))
+            return True
+
+    def pop(self, n: int = 1) -> List[Tuple[int, str]]:
+        """Lease up to n (entry_id, url) pairs from the head of the frontier."""
+        with self._lock, self.batch():
+            rows = self._conn.execute(
+                "SELECT id, url FROM frontier WHERE leased = 0 ORDER BY id LIMIT ?", (n,)).fetchall()
+            self._conn.executemany("UPDATE frontier SET leased = 1 WHERE id = ?", [(r[0],) for r in rows])
+        return [(r[0], r[1]) for r in rows]
+
+    def done(self, entry_id: int, url: str, ok: bool):
+        """Retire a leased frontier entry; ok=True records url as a crawled page."""
+        with self._lock:
+            self._conn.execute("DELETE FROM frontier WHERE id = ?", (entry_id,))
+            if ok:
+                self._conn.execute("INSERT INTO pages (url) VALUES (?)", (url,))
+                # counted once committed, so a rolled-back batch leaves it unchanged
+                if self._depth:
+                    self._uncommitted += 1
+                else:
+                    self.visited_count += 1
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM frontier WHERE leased = 0").fetchone()[0]
+
+    def pages(self, limit: Optional[int] = None) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT url FROM pages ORDER BY url LIMIT ?",
+                                      (-1 if limit is None else limit,)).fetchall()
+        return (r[0] for r in rows)
+
+    # ---------------- lifecycle ----------------
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def discard(self):
+        """Close and delete the on-disk state (finished crawls)."""
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def purge_stale(state_dir: str = STATE_DIR, ttl: int = STATE_TTL) -> int:
+    """Delete crawl state files untouched for more than ttl seconds."""
+    if not os.path.isdir(state_dir):
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        try:
+            if ".sqlite3" in name and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
@@ -0,0 +1,624 @@
+# tools/docmeta.py
+"""
+Bounded-read metadata readers for MetaSpy.
+
+Each reader takes a seekable binary file object and touches only the bytes
+that carry metadata: the PDF trailer, cross-reference entries and Info
+dictionary; docProps/core.xml and app.xml of a DOCX; the EXIF / XMP
+segments at the head of a JPEG or PNG. Cost depends on the metadata, not
+on the file size.
+"""
+import re
+import struct
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+PDF_TAIL = 8192                 # startxref must be near the end
+PDF_CHUNK = 64 * 1024
+PDF_MAX_OBJECT = 4 * 1024 * 1024
+PDF_MAX_SECTIONS = 64
+MAX_XML = 4 * 1024 * 1024       # docProps parts and XMP packets
+MAX_SEGMENT_SCAN = 256          # JPEG markers / PNG chunks before giving up
+
+XMP_JPEG_ID = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_PNG_KEYWORD = b"XML:com.adobe.xmp"
+
+
+class MetadataUnsupported(ValueError):
+    """The fast path cannot handle this file (callers fall back to a full parser)."""
+
+
+# =====================================================================
+# PDF
+# =====================================================================
+class _Ref(tuple):
+    pass
+
+
+class _Name(str):
+    pass
+
+
+_WS = b" \t\r\n\x0c\x00"
+_DELIM = b"()<>[]{}/%"
+_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\x0c",
+            ord("("): b"(", ord(")"): b")", ord("\\"): b"\\"}
+
+
+class _Lexer:
+    """Just enough of the PDF object syntax for trailers and Info dictionaries."""
+
+    def __init__(self, data: bytes, pos: int = 0):
+        self.data = data
+        self.pos = pos
+
+    def _skip(self):
+        d = self.data
+        while self.pos < len(d):
+            c = d[self.pos:self.pos + 1]
+            if c in _WS and c:
+                self.pos += 1
+            elif c == b"%":
+                while self.pos < len(d) and d[self.pos:self.pos + 1] not in (b"\r", b"\n"):
+                    self.pos += 1
+            else:
+                break
+
+    def _token(self) -> bytes:
+        self._skip()
+        start = self.pos
+        d = self.data
+        while self.pos < len(d) and d[self.pos:self.pos + 1] not in _WS and d[self.pos:self.pos + 1] not in _DELIM:
+            self.pos += 1
+        return d[start:self.pos]
+
+    def parse(self):
+        self._skip()
+        if self.pos >= len(self.data):
+            raise MetadataUnsupported("unexpected end of PDF object")
+        d = self.data
+        c = d[self.pos:self.pos + 1]
+        if d.startswith(b"<<", self.pos):
+            self.pos += 2
+            out = {}
+            while True:
+                self._skip()
+                if d.startswith(b">>", self.pos):
+                    self.pos += 2
+                    return out
+                key = self.parse()
+                if not isinstance(key, _Name):
+                    raise MetadataUnsupported("bad dictionary key")
+                out[str(key)] = self.parse()
+        if c == b"[":
+            self.pos += 1
+            out = []
+            while True:
+                self._skip()
+                if d.startswith(b"]", self.pos):
+                    self.pos += 1
+                    return out
+                out.append(self.parse())
+        if c == b"/":
+            self.pos += 1
+            raw = self._token()
+            return _Name(re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw)
+                         .decode("latin-1"))
+        if c == b"(":
+            return self._literal()
+        if c == b"<":
+            end = d.index(b">", self.pos)
+            hexdata = re.sub(rb"\s", b"", d[self.pos + 1:end])
+            self.pos = end + 1
+            if len(hexdata) % 2:
+                hexdata += b"0"
+            return bytes.fromhex(hexdata.decode("ascii"))
+
+        tok = self._token()
+        if not tok:
+            raise MetadataUnsupported(f"unexpected byte {c!r} in PDF object")
+        if tok == b"true":
+            return True
+        if tok == b"false":
+            return False
+        if tok == b"null":
+            return None
+        try:
+            num = float(tok) if b"." in tok else int(tok)
+        except ValueError:
+            return tok.decode("latin-1")
+        # "num gen R" is an indirect reference
+        if isinstance(num, int):
+            save = self.pos
+            gen = self._token()
+            if gen.isdigit() and self._token() == b"R":
+                return _Ref((num, int(gen)))
+            self.pos = save
+        return num
+
+    def _literal(self) -> bytes:
+        d = self.data
+        self.pos += 1
+        depth = 1
+        out = bytearray()
+        while self.pos < len(d):
+            ch = d[self.pos]
+            self.pos += 1
+            if ch == 0x5C:  # backslash
+                nxt = d[self.pos] if self.pos < len(d) else None
+                if nxt is None:
+                    break
+                if nxt in _ESCAPES:
+                    out += _ESCAPES[nxt]
+                    self.pos += 1
+                elif 0x30 <= nxt <= 0x37:
+                    m = re.match(rb"[0-7]{1,3}", d[self.pos:self.pos + 3])
+                    out.append(int(m.group(0), 8) & 0xFF)
+                    self.pos += len(m.group(0))
+                elif nxt in (0x0D, 0x0A):
+                    self.pos += 1
+                    if nxt == 0x0D and d[self.pos:self.pos + 1] == b"\n":
+                        self.pos += 1
+                else:
+                    out.append(nxt)
+                    self.pos += 1
+            elif ch == 0x28:
+                depth += 1
+                out.append(ch)
+            elif ch == 0x29:
+                depth -= 1
+                if depth == 0:
+                    return bytes(out)
+                out.append(ch)
+            else:
+                out.append(ch)
+        raise MetadataUnsupported("unterminated PDF string")
+
+
+def _int(value, what: str) -> int:
+    """A PDF number that must be an integer; anything else (a Ref, a name...) is unsupported."""
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise MetadataUnsupported(f"bad {what}")
+    return value
+
+
+def _inflate(data: bytes, limit: int) -> bytes:
+    """zlib data decoded to at most `limit` bytes; anything bigger is left to the full parsers."""
+    d = zlib.decompressobj()
+    out = d.decompress(data, limit)
+    if d.unconsumed_tail:
+        raise MetadataUnsupported("compressed data too large")
+    return out
+
+
+def _pdf_text(value: bytes) -> str:
+    if value.startswith(b"\xfe\xff"):
+        return value[2:].decode("utf-16-be", errors="replace")
+    if value.startswith(b"\xef\xbb\xbf"):
+        return value[3:].decode("utf-8", errors="replace")
+    return value.decode("latin-1")
+
+
+def _read_at(f, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+
+def _read_object_bytes(f, offset: int) -> bytes:
+    """Bytes of the indirect object at offset, up to and including 'endobj' (bounded)."""
+    buf = b""
+    while len(buf) < PDF_MAX_OBJECT:
+        chunk = _read_at(f, offset + len(buf), PDF_CHUNK)
+        if not chunk:
+            break
+        buf += chunk
+        end = buf.find(b"endobj", max(0, len(buf) - len(chunk) - 6))
+        if end != -1:
+            return buf[:end + 6]
+    return buf
+
+
+def _parse_indirect(data: bytes) -> Tuple[Any, int]:
+    """(object, position after it) for b'n g obj <object> ...'."""
+    m = re.match(rb"\s*(\d+)\s+(\d+)\s+obj", data)
+    if not m:
+        raise MetadataUnsupported("expected indirect object")
+    lex = _Lexer(data, m.end())
+    obj = lex.parse()
+    return obj, lex.pos
+
+
+def _read_stream(f, offset: int) -> Tuple[Dict[str, Any], bytes]:
+    """(dictionary, decoded data) of the stream object at offset; reads exactly /Length bytes."""
+    head = _read_at(f, offset, PDF_CHUNK)
+    header, pos = _parse_indirect(head)
+    m = re.compile(rb"\s*stream(\r\n|\n|\r)").match(head, pos)
+    if not isinstance(header, dict) or not m:
+        raise MetadataUnsupported("expected stream")
+    length = header.get("Length")
+    if not isinstance(length, int) or not 0 <= length <= PDF_MAX_OBJECT:
+        raise MetadataUnsupported("unsupported stream length")
+    raw = _read_at(f, offset + m.end(), length)
+    filters = header.get("Filter")
+    filters = filters if isinstance(filters, list) else ([filters] if filters else [])
+    params = header.get("DecodeParms")
+    params = params[0] if isinstance(params, list) and params else params
+    for name in filters:
+        if name != "FlateDecode":
+            raise MetadataUnsupported(f"unsupported filter {name}")
+        raw = _inflate(raw, PDF_MAX_OBJECT)
+        if isinstance(params, dict) and _int(params.get("Predictor", 1), "Predictor") >= 10:
+            columns = _int(params.get("Columns", 1), "Columns")
+            if not 0 < columns <= PDF_CHUNK:
+                raise MetadataUnsupported("bad Columns")
+            raw = _png_unpredict(raw, columns)
+    return header, raw
+
+
+def _png_unpredict(data: bytes, columns: int) -> bytes:
+    out = bytearray()
+    prev = bytearray(columns)
+    row_len = columns + 1
+    for i in range(0, len(data) - columns, row_len):
+        kind = data[i]
+        row = bytearray(data[i + 1:i + row_len])
+        if kind == 2:
+            row = bytearray((row[j] + prev[j]) & 0xFF for j in range(columns))
+        elif kind == 1:
+            for j in range(1, columns):
+                row[j] = (row[j] + row[j - 1]) & 0xFF
+        elif kind != 0:
+            raise MetadataUnsupported(f"unsupported PNG predictor {kind}")
+        out += row
+        prev = row
+    return bytes(out)
+
+
+class _ClassicSection:
+    """A 'xref' table; entries are read one by one only when looked up."""
+
+    def __init__(self, f, offset: int):
+        self.f = f
+        self.subsections: List[Tuple[int, int, int]] = []   # (first obj, count, file offset of entries)
+        pos = offset + 4
+        while True:
+            head = _read_at(f, pos, 128)
+            m = re.match(rb"\s*(\d+)\s+(\d+)[ \t]*(\r\n|\r|\n| \r| \n)", head)
+            if not m:
+                break
+            first, count = int(m.group(1)), int(m.group(2))
+            self.subsections.append((first, count, pos + m.end()))
+            pos += m.end() + 20 * count
+        head = _read_at(f, pos, PDF_CHUNK)
+        m = re.match(rb"\s*trailer", head)
+        if not m:
+            raise MetadataUnsupported("xref table without trailer")
+        self.trailer = _Lexer(head, m.end()).parse()
+
+    def lookup(self, num: int):
+        for first, count, pos in self.subsections:
+            if first <= num < first + count:
+                entry = _read_at(self.f, pos + 20 * (num - first), 20)
+                m = re.match(rb"(\d{10}) (\d{5}) ([nf])", entry)
+                if m and m.group(3) == b"n":
+                    return ("offset", int(m.group(1)))
+                return None
+        return None
+
+
+class _StreamSection:
+    """A cross-reference stream (PDF 1.5+)."""
+
+    def __init__(self, f, offset: int):
+        header, self.rows = _read_stream(f, offset)
+        if header.get("Type") != "XRef":
+            raise MetadataUnsupported("startxref does not point at an xref")
+        self.trailer = header
+        widths = header.get("W")
+        index = header.get("Index") or [0, header.get("Size", 0)]
+        if not isinstance(widths, list) or len(widths) != 3 or not isinstance(index, list):
+            raise MetadataUnsupported("bad xref stream header")
+        self.widths = [_int(w, "W") for w in widths]
+        index = [_int(n, "Index") for n in index]
+        self.index = list(zip(index[0::2], index[1::2]))
+
+    def lookup(self, num: int):
+        row_len = sum(self.widths)
+        row = 0
+        for first, count in self.index:
+            if first <= num < first + count:
+                start = (row + num - first) * row_len
+                fields, p = [], start
+                for w in self.widths:
+                    fields.append(int.from_bytes(self.rows[p:p + w], "big") if w else None)
+                    p += w
+                kind = 1 if fields[0] is None else fields[0]
+                if kind == 1:
+                    return ("offset", fields[1])
+                if kind == 2:
+                    return ("stream", fields[1], fields[2])
+                return None
+            row += count
+        return None
+
+
+class _PdfFile:
+    def __init__(self, f):
+        self.f = f
+        size = f.seek(0, 2)
+        tail = _read_at(f, max(0, size - PDF_TAIL), PDF_TAIL)
+        matches = list(re.finditer(rb"startxref\s+(\d+)", tail))
+        if not matches:
+            raise MetadataUnsupported("no startxref")
+        self.sections = []
+        self.trailer: Dict[str, Any] = {}
+        offset = int(matches[-1].group(1))
+        seen = set()
+        while offset is not None and offset not in seen and len(seen) < PDF_MAX_SECTIONS:
+            seen.add(offset)
+            if _read_at(f, offset, 4) == b"xref":
+                section = _ClassicSection(f, offset)
+            else:
+                section = _StreamSection(f, offset)
+            self.sections.append(section)
+            # hybrid files: the table's companion stream holds the compressed objects
+            if isinstance(section.trailer.get("XRefStm"), int):
+                self.sections.append(_StreamSection(f, section.trailer["XRefStm"]))
+            for key, value in section.trailer.items():
+                self.trailer.setdefault(key, value)
+            prev = section.trailer.get("Prev")
+            offset = prev if isinstance(prev, int) else None
+        self._objstm_cache: Dict[int, Tuple[bytes, List[int]]] = {}
+
+    def _locate(self, num: int):
+        for section in self.sections:
+            found = section.lookup(num)
+            if found is not None:
+                return found
+        return None
+
+    def resolve(self, value, depth: int = 0):
+        if not isinstance(value, _Ref) or depth > 8:
+            return value
+        where = self._locate(value[0])
+        if where is None:
+            return None
+        if where[0] == "offset":
+            obj, _ = _parse_indirect(_read_object_bytes(self.f, where[1]))
+        else:
+            obj = self._from_object_stream(where[1], where[2])
+        return self.resolve(obj, depth + 1)
+
+    def _from_object_stream(self, stream_num: int, index: int):
+        if stream_num not in self._objstm_cache:
+            where = self._locate(stream_num)
+            if where is None or where[0] != "offset":
+                raise MetadataUnsupported("object stream not found")
+            header, body = _read_stream(self.f, where[1])
+            first = _int(header.get("First"), "First")
+            nums = [int(x) for x in body[:first].split()]
+            offsets = [first + off for off in nums[1::2]]
+            self._objstm_cache[stream_num] = (body, offsets)
+        body, offsets = self._objstm_cache[stream_num]
+        return _Lexer(body, offsets[index]).parse()
+
+
+def pdf_info(f) -> Dict[str, Any]:
+    """Document Info dictionary of a PDF (keys without the leading '/')."""
+    try:
+        return _pdf_info(f)
+    except (TypeError, AttributeError, ValueError, KeyError, IndexError, zlib.error) as e:
+        # malformed structure in a shape we did not anticipate: let the full parser try
+        if isinstance(e, MetadataUnsupported):
+            raise
+        raise MetadataUnsupported(f"malformed PDF: {e}") from e
+
+
+def _pdf_info(f) -> Dict[str, Any]:
+    pdf = _PdfFile(f)
+    if "Encrypt" in pdf.trailer:
+        raise MetadataUnsupported("encrypted PDF")
+    info = pdf.resolve(pdf.trailer.get("Info"))
+    if not isinstance(info, dict):
+        return {}
+    meta = {}
+    for key, value in info.items():
+        value = pdf.resolve(value)
+        if isinstance(value, bytes):
+            meta[key] = _pdf_text(value)
+        elif isinstance(value, _Name):
+            meta[key] = "/" + value
+        elif value is not None:
+            meta[key] = str(value)
+    return meta
+
+
+# =====================================================================
+# DOCX
+# =====================================================================
+_CORE_FIELDS = {
+    "creator": "author",
+    "title": "title",
+    "subject": "subject",
+    "lastModifiedBy": "last_modified_by",
+    "category": "category",
+    "description": "comments",
+    "keywords": "keywords",
+    "revision": "revision",
+    "created": "created",
+    "modified": "modified",
+    "lastPrinted": "last_printed",
+}
+_APP_FIELDS = {
+    "Application": "application",
+    "AppVersion": "app_version",
+    "Company": "company",
+    "Manager": "manager",
+    "Template": "template",
+    "TotalTime": "total_edit_minutes",
+    "Pages": "pages",
+    "Words": "words",
+}
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _zip_xml(zf: zipfile.ZipFile, name: str) -> Optional[ET.Element]:
+    try:
+        info = zf.getinfo(name)
+    except KeyError:
+        return None
+    if info.file_size > MAX_XML:
+        raise MetadataUnsupported(f"{name} too large")
+    with zf.open(info) as part:
+        return ET.fromstring(part.read(MAX_XML + 1))
+
+
+def _w3cdtf(value: str) -> str:
+    """ISO string the way python-docx printed core property datetimes."""
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        return value
+
+
+def docx_properties(f) -> Dict[str, Any]:
+    """Core (docProps/core.xml) and extended (docProps/app.xml) properties, read from the zip directory."""
+    meta: Dict[str, Any] = {"author": None, "title": None, "subject": None, "last_modified_by": None,
+                            "category": None, "comments": None}
+    with zipfile.ZipFile(f) as zf:
+        core = _zip_xml(zf, "docProps/core.xml")
+        if core is not None:
+            for el in core:
+                key = _CORE_FIELDS.get(_local(el.tag))
+                if key and el.text:
+                    meta[key] = _w3cdtf(el.text) if key in ("created", "modified", "last_printed") else el.text
+        app = _zip_xml(zf, "docProps/app.xml")
+        if app is not None:
+            for el in app:
+                key = _APP_FIELDS.get(_local(el.tag))
+                if key and el.text:
+                    meta[key] = el.text
+    return meta
+
+
+# =====================================================================
+# Images
+# =====================================================================
+def _jpeg_segments(f) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """(TIFF-formatted EXIF block, XMP packet) from APP1 segments; stops at start-of-scan."""
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        raise MetadataUnsupported("not a JPEG")
+    exif = xmp = None
+    for _ in range(MAX_SEGMENT_SCAN):
+        head = f.read(2)
+        while head[:1] == b"\xff" and head[1:2] == b"\xff":  # fill bytes
+            head = head[1:] + f.read(1)
+        if len(head) < 2 or head[0] != 0xFF:
+            break
+        marker = head[1]
+        if marker in (0xD9, 0xDA):      # EOI / SOS: image data follows, no more metadata
+            break
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            continue
+        size = f.read(2)
+        if len(size) < 2:
+            raise MetadataUnsupported("truncated JPEG segment")
+        length = struct.unpack(">H", size)[0] - 2
+        if length < 0:
+            raise MetadataUnsupported("bad JPEG segment length")
+        if marker == 0xE1:
+            payload = f.read(length)
+            if payload.startswith(b"Exif\x00\x00") and exif is None:
+                exif = payload[6:]
+            elif payload.startswith(XMP_JPEG_ID) and xmp is None:
+                xmp = payload[len(XMP_JPEG_ID):]
+        else:
+            f.seek(length, 1)
+        if exif is not None and xmp is not None:
+            break
+    return exif, xmp
+
+
+def _png_chunks(f) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """(eXIf chunk, XMP iTXt packet); stops at the first IDAT."""
+    f.seek(0)
+    if f.read(8) != b"\x89PNG\r\n\x1a\n":
+        raise MetadataUnsupported("not a PNG")
+    exif = xmp = None
+    for _ in range(MAX_SEGMENT_SCAN):
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        length, kind = struct.unpack(">I4s", head)
+        if kind in (b"IDAT", b"IEND"):
+            break
+        if kind == b"eXIf" and length <= MAX_XML:
+            exif = f.read(length)
+            f.seek(4, 1)
+        elif kind == b"iTXt" and length <= MAX_XML:
+            data = f.read(length)
+            f.seek(4, 1)
+            keyword, _, rest = data.partition(b"\x00")
+            if keyword == XMP_PNG_KEYWORD and len(rest) >= 2:
+                compressed = rest[0]
+                # skip compression method, language tag and translated keyword
+                text = rest[2:].split(b"\x00", 2)[-1]
+                try:
+                    xmp = _inflate(text, MAX_XML) if compressed else text
+                except zlib.error:
+                    raise MetadataUnsupported("bad compressed XMP")
+        else:
+            f.seek(length + 4, 1)
+    return exif, xmp
+
+
+def image_segments(f, kind: str) -> Tuple[Optional[bytes], Optional[bytes]]:
+    """(raw TIFF EXIF block, XMP packet) for kind 'jpeg' or 'png'."""
+    return _jpeg_segments(f) if kind == "jpeg" else _png_chunks(f)
+
+
+def parse_xmp(packet: bytes) -> Dict[str, str]:
+    """Flatten simple XMP properties to {'prefix:Name': value} (lists joined with '; ')."""
+    if not packet or len(packet) > MAX_XML:
+        return {}
+    start = packet.find(b"<x:xmpmeta")
+    if start == -1:
+        start = packet.find(b"<rdf:RDF")
+    end = packet.rfind(b"</x:xmpmeta>")
+    if end != -1:
+        packet = packet[start:end + len(b"</x:xmpmeta>")]
+    elif start > 0:
+        packet = packet[start:]
+    try:
+        root = ET.fromstring(packet)
+    except ET.ParseError:
+        return {}
+
+    prefixes = {uri.decode(): prefix.decode() for prefix, uri in re.findall(rb'xmlns:([\w.-]+)="([^"]+)"', packet)}
+
+    def qname(tag: str) -> str:
+        if tag.startswith("{"):
+            uri, name = tag[1:].split("}", 1)
+            return f"{prefixes.get(uri, uri)}:{name}"
+        return tag
+
+    out: Dict[str, str] = {}
+    for desc in root.iter("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description"):
+        for attr, value in desc.attrib.items():
+            if not attr.startswith("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}"):
+                out[qname(attr)] = value
+        for prop in desc:
+            items = [li.text.strip() for li in prop.iter("{http://www.w3.org/1999/02/22-rdf-syntax-ns#}li")
+                     if li.text and li.text.strip()]
+            if items:
+                out[qname(prop.tag)] = "; ".join(items)
+            elif prop.text and prop.text.strip():
+                out[qname(prop.tag)] = prop.text.strip()
+    return out
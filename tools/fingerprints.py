@@ -0,0 +1,209 @@
+# tools/fingerprints.py
+import json
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from packaging.version import parse as parse_version  # pip install packaging
+
+DEFAULT_SIGNATURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "bannerhunter_signatures.jsonl")
+MATCH_CACHE_SIZE = 8192
+MIN_TOKEN_LEN = 3
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+_REGEX_FLAGS = {"i": re.I, "s": re.S, "m": re.M}
+_VERSION_RE = re.compile(r"[0-9]+(?:\.[0-9]+)*")
+
+
+class _TokenMatcher:
+    """
+    Small Aho-Corasick automaton over lowercase literal tokens.
+    search(text) returns every payload whose token occurs in text, in one pass.
+    """
+
+    def __init__(self, tokens: Dict[str, Iterable[int]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for token, payload in tokens.items():
+            node = 0
+            for ch in token:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                node = nxt
+            self._out[node] = self._out[node] + tuple(payload)
+
+        # breadth-first fail links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> set:
+        hits = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+        return hits
+
+
+def _top_level_alternation(pattern: str) -> bool:
+    """True if the regex has a "|" outside every group and character class."""
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if in_class:
+            if ch == "]":
+                in_class = False
+        elif ch == "[":
+            in_class = True
+            if pattern[i + 1:i + 2] == "^":
+                i += 1
+            if pattern[i + 1:i + 2] == "]":
+                i += 1          # a leading "]" is a literal member
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth = max(0, depth - 1)
+        elif ch == "|" and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+def _leading_literal(pattern: str) -> Optional[str]:
+    """
+    Best-effort literal prefix of a regex, used when a signature lists no
+    tokens. None for top-level alternations, whose other branches would
+    never be tried.
+    """
+    if _top_level_alternation(pattern):
+        return None
+    lit = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            ch = pattern[i + 1]
+            i += 1
+        elif ch in _REGEX_META:
+            break
+        nxt = pattern[i + 1] if i + 1 < len(pattern) else ""
+        if nxt in ("?", "*", "{"):
+            break
+        lit.append(ch)
+        i += 1
+    token = "".join(lit).strip().lower()
+    return token if len(token) >= MIN_TOKEN_LEN else None
+
+
+class FingerprintDB:
+    """
+    Banner fingerprint engine.
+    Signatures are compiled once, candidates are prefiltered with an
+    Aho-Corasick pass over their literal tokens, and version thresholds are
+    parsed at load time. match(banner) -> (product, version, risk).
+    """
+
+    def __init__(self, signatures: Iterable[Dict[str, Any]]):
+        self.signatures: List[Dict[str, Any]] = []
+        always: List[int] = []
+        tokens: Dict[str, List[int]] = {}
+
+        for sig in signatures:
+            flags = 0
+            for ch in sig.get("flags") or "":
+                flags |= _REGEX_FLAGS.get(ch, 0)
+            threshold = sig.get("threshold")
+            try:
+                parsed_threshold = parse_version(str(threshold)) if threshold else None
+            except Exception:
+                parsed_threshold = None
+            idx = len(self.signatures)
+            self.signatures.append({
+                "product": sig["product"],
+                "regex": re.compile(sig["pattern"], flags),
+                "group": int(sig.get("group", 1)),
+                "threshold": parsed_threshold,
+            })
+
+            sig_tokens = [t.lower() for t in (sig.get("tokens") or []) if t]
+            if not sig_tokens:
+                lit = _leading_literal(sig["pattern"])
+                sig_tokens = [lit] if lit else []
+            if not sig_tokens:
+                always.append(idx)
+            for t in sig_tokens:
+                tokens.setdefault(t, []).append(idx)
+
+        self._always = always
+        self._matcher = _TokenMatcher(tokens)
+        self.match = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._match)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SIGNATURES) -> "FingerprintDB":
+        """Load a JSON-lines signature file (blank lines and # comments are skipped)."""
+        sigs = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                sigs.append(json.loads(line))
+        return cls(sigs)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _match(self, banner: str):
+        banner_clean = banner.strip()
+        candidates = self._matcher.search(banner_clean.lower())
+        candidates.update(self._always)
+
+        # signature file order is the priority order
+        for idx in sorted(candidates):
+            sig = self.signatures[idx]
+            m = sig["regex"].search(banner_clean)
+            if not m:
+                continue
+            try:
+                version_raw = m.group(sig["group"])
+            except (IndexError, re.error):
+                version_raw = m.group(1) if m.re.groups else None
+            vm = _VERSION_RE.search(version_raw or "")
+            if not vm:
+                return sig["product"], None, "unknown"
+            ver_norm = vm.group(0)
+            risk = "unknown"
+            if sig["threshold"] is not None:
+                try:
+                    risk = "potentially_outdated" if parse_version(ver_norm) <= sig["threshold"] else "ok"
+                except Exception:
+                    risk = "unknown"
+            return sig["product"], ver_norm, risk
+        return None, None, "unknown"
@@ -0,0 +1,166 @@
+# tools/jobs.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from tools.resultstore import ResultStore, results as default_results
+
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", 32))
+JOB_TTL = int(os.environ.get("JOB_TTL", 3600))
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE = (QUEUED, RUNNING)
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """
+    One background scan. The scan function is called as fn(progress, stop):
+    progress(done, total=None, message=None) reports how far it got and
+    stop is a threading.Event it should poll to end early.
+    """
+
+    def __init__(self, tool: str, target: str, params: Optional[Dict[str, Any]]):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.target = target
+        self.params = params or {}
+        self.status = QUEUED
+        self.done = 0
+        self.total: Optional[int] = None
+        self.message: Optional[str] = None
+        self.result: Any = None
+        self.result_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.stop = threading.Event()
+
+    def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "tool": self.tool, "target": self.target, "status": self.status,
+            "done": self.done, "total": self.total, "message": self.message, "error": self.error,
+            "result_id": self.result_id, "created": self.created, "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobManager:
+    """
+    Bounded background runner for long scans so request threads return at once.
+
+    At most `workers` jobs run at a time and at most `max_pending` wait;
+    submit() raises JobQueueFull beyond that. Identical submissions (same
+    tool/target/params) join the active job, and a fresh stored result is
+    handed back as an already finished job. Completed results go into the
+    shared ResultStore, so follow-up actions find them by result_id.
+    Cancelled jobs keep whatever partial result the scan returned but do
+    not publish it to the store.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING, ttl: int = JOB_TTL,
+                 store: ResultStore = default_results):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}   # result-store key -> active job
+
+    def _prune(self):
+        now = time.time()
+        for jid in [jid for jid, j in self._jobs.items() if not j.active and now - j.finished > self.ttl]:
+            del self._jobs[jid]
+
+    def submit(self, tool: str, target: str, params: Optional[Dict[str, Any]],
+               fn: Callable[[Callable, threading.Event], Any], refresh: bool = False) -> Job:
+        key = self.store.make_key(tool, target, params)
+        with self._lock:
+            self._prune()
+            job = self._active.get(key)
+            if job is not None:
+                return job
+
+            job = Job(tool, target, params)
+            stored = None if refresh else self.store.latest(tool, target, params)
+            if stored is not None:
+                job.result_id, job.result = stored
+                job.status = DONE
+                job.started = job.finished = time.time()
+                self._jobs[job.id] = job
+                return job
+
+            if sum(1 for j in self._active.values() if j.status == QUEUED) >= self.max_pending:
+                raise JobQueueFull("too many scans queued, try again shortly")
+            self._jobs[job.id] = job
+            self._active[key] = job
+        self._pool.submit(self._run, job, key, fn)
+        return job
+
+    def _run(self, job: Job, key: str, fn):
+        try:
+            # cancel() marks queued jobs under the lock; only a still-queued job may start
+            with self._lock:
+                if job.status != QUEUED or job.stop.is_set():
+                    return
+                job.status = RUNNING
+                job.started = time.time()
+            job.result = fn(job.progress, job.stop)
+            if job.stop.is_set():
+                job.status = CANCELLED
+            else:
+                job.result_id = self.store.put(job.tool, job.target, job.params, job.result)
+                job.status = DONE
+        except Exception as e:
+            job.error = str(e) or e.__class__.__name__
+            job.status = FAILED
+        finally:
+            job.finished = job.finished or time.time()
+            with self._lock:
+                if self._active.get(key) is job:
+                    del self._active[key]
+
+    def get(self, job_id: Optional[str], tool: Optional[str] = None) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id or "")
+        if job is None or (tool and job.tool != tool):
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Ask a job to stop; queued jobs never start. False if unknown or already finished."""
+        job = self.get(job_id)
+        if job is None or not job.active:
+            return False
+        job.stop.set()
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished = time.time()
+                key = self.store.make_key(job.tool, job.target, job.params)
+                if self._active.get(key) is job:
+                    del self._active[key]
+        return True
+
+
+jobs = JobManager()
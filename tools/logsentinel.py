@@ -0,0 +1,811 @@
+# tools/logsentinel.py
+import glob
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from calendar import timegm
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+STATE_PATH = os.environ.get("LOGSENTINEL_STATE_PATH",
+                            os.path.join(tempfile.gettempdir(), "cybersentinel_logsentinel.sqlite3"))
+# only files under these directories may be analyzed
+LOG_ROOTS = [p for p in os.environ.get("LOGSENTINEL_ROOTS", "/var/log").split(os.pathsep) if p]
+DEFAULT_LOGS = (
+    "/var/log/auth.log", "/var/log/secure", "/var/log/syslog", "/var/log/messages",
+    "/var/log/nginx/access.log", "/var/log/apache2/access.log", "/var/log/httpd/access_log",
+)
+
+CHUNK_SIZE = 4 * 1024 * 1024
+MAX_LINE = 64 * 1024          # longer lines are skipped rather than buffered
+HEAD_BYTES = 256              # prefix hashed to recognise a file that was truncated and rewritten
+SAMPLES_PER_RULE = 20
+SAMPLE_CHARS = 300
+
+SEVERITY_ORDER = {"high": 0, "medium": 1, "low": 2, "info": 3}
+
+# windowed detection: sketch sizes are per detector and per log file
+SKETCH_WIDTH = 16384
+SKETCH_DEPTH = 4
+BLOOM_BITS = 1 << 21
+BLOOM_HASHES = 4
+TOP_K = 20
+MAX_ALERTS = 200              # per detector per file; further alerts are only counted
+
+# Detection rules. Each "patterns" entry is a bytes regex that starts with a
+# literal and never spans a newline; it finds the line. "nocase" rules are
+# written in lowercase and matched against a lowered copy of the chunk. The
+# optional "fields" regex is only run on hit lines to pull out ip / user.
+RULES: List[Dict[str, Any]] = [
+    # ---- auth (sshd / PAM / sudo) ----
+    {"id": "ssh_failed_password", "source": "auth", "severity": "medium", "title": "SSH failed password",
+     "patterns": [rb"Failed password for "],
+     "fields": rb"Failed password for (?:invalid user )?(?P<user>\S+) from (?P<ip>\S+)"},
+    {"id": "ssh_invalid_user", "source": "auth", "severity": "medium", "title": "SSH invalid user",
+     "patterns": [rb"Invalid user \S+ from "],
+     "fields": rb"Invalid user (?P<user>\S+) from (?P<ip>\S+)"},
+    {"id": "pam_auth_failure", "source": "auth", "severity": "medium", "title": "PAM authentication failure",
+     "patterns": [rb"pam_unix\([^)\n]*\): authentication failure"],
+     "fields": rb"rhost=(?P<ip>\S*)(?:\s+user=(?P<user>\S+))?"},
+    {"id": "ssh_max_auth", "source": "auth", "severity": "high", "title": "SSH too many authentication failures",
+     "patterns": [rb"maximum authentication attempts exceeded"],
+     "fields": rb"for (?:invalid user )?(?P<user>\S+) from (?P<ip>\S+)"},
+    {"id": "sudo_failure", "source": "auth", "severity": "high", "title": "sudo incorrect password",
+     "patterns": [rb"incorrect password attempt"],
+     "fields": rb"sudo:\s+(?P<user>\S+)"},
+    {"id": "ssh_accepted", "source": "auth", "severity": "info", "title": "SSH login accepted",
+     "patterns": [rb"Accepted (?:password|publickey|keyboard-interactive/pam) for "],
+     "fields": rb"Accepted \S+ for (?P<user>\S+) from (?P<ip>\S+)"},
+    {"id": "root_session", "source": "auth", "severity": "low", "title": "Root session opened",
+     "patterns": [rb"session opened for user root"]},
+
+    # ---- syslog / kernel ----
+    {"id": "oom_kill", "source": "syslog", "severity": "high", "title": "Out-of-memory kill",
+     "patterns": [rb"Out of memory: Kill"]},
+    {"id": "segfault", "source": "syslog", "severity": "medium", "title": "Process segfault",
+     "patterns": [rb" segfault at "]},
+    {"id": "service_failed", "source": "syslog", "severity": "low", "title": "systemd unit failed",
+     "patterns": [rb"Failed with result"]},
+    {"id": "firewall_block", "source": "syslog", "severity": "low", "title": "Firewall dropped packet",
+     "patterns": [rb"\[UFW BLOCK\]"],
+     "fields": rb"SRC=(?P<ip>\S+)"},
+
+    # ---- web access logs (common / combined format) ----
+    {"id": "web_404", "source": "web", "severity": "info", "title": "HTTP 404",
+     "patterns": [rb"\" 404 [\d-]"],
+     "fields": rb"^(?P<ip>\S+)"},
+    {"id": "web_5xx", "source": "web", "severity": "low", "title": "HTTP 5xx",
+     "patterns": [rb"\" 5\d\d [\d-]"],
+     "fields": rb"^(?P<ip>\S+)"},
+    {"id": "web_path_traversal", "source": "web", "severity": "high", "title": "Path traversal attempt",
+     "patterns": [rb"\.\./", rb"%2e%2e(?:%2f|/)"], "nocase": True,
+     "fields": rb"^(?P<ip>\S+)"},
+    {"id": "web_sqli", "source": "web", "severity": "high", "title": "SQL injection probe",
+     "patterns": [rb"union(?:[ \t+]|%20)+(?:all(?:[ \t+]|%20)+)?select", rb"%27(?:[ \t+]|%20)*or(?:[ \t+]|%20)",
+                  rb"sleep\(\d+\)"], "nocase": True,
+     "fields": rb"^(?P<ip>\S+)"},
+    {"id": "web_sensitive_file", "source": "web", "severity": "medium", "title": "Sensitive file probe",
+     "patterns": [rb"/\.env", rb"/\.git/", rb"/wp-config\.php", rb"/etc/passwd", rb"/\.aws/credentials"],
+     "nocase": True,
+     "fields": rb"^(?P<ip>\S+)"},
+    {"id": "web_scanner", "source": "web", "severity": "medium", "title": "Scanner user agent",
+     "patterns": [rb"sqlmap", rb"nikto", rb"nmap scripting engine", rb"masscan", rb"wpscan", rb"zgrab",
+                  rb"nuclei"], "nocase": True,
+     "fields": rb"^(?P<ip>\S+)"},
+]
+
+
+class RuleSet:
+    """
+    The detection rules compiled once into a flat set of literal-prefixed
+    patterns. CPython's re finds a literal prefix with a fast substring
+    search, so each pattern sweeps a chunk at memory speed; one big
+    alternation across rules loses that and runs a few MB/s. Only hit lines
+    are touched from Python, and a line matching several patterns of one
+    rule counts once for that rule.
+    """
+
+    def __init__(self, rules: Iterable[Dict[str, Any]] = RULES):
+        self.rules = list(rules)
+        self.patterns = [(i, re.compile(p), bool(r.get("nocase")))
+                         for i, r in enumerate(self.rules) for p in r["patterns"]]
+        self.nocase = any(nocase for _, _, nocase in self.patterns)
+        self.fields = [re.compile(r["fields"]) if r.get("fields") else None for r in self.rules]
+
+    def hits(self, buf: bytes, end: int) -> List[Tuple[int, int, int]]:
+        """(line start, rule index, line end) for the complete lines in buf[:end], in file order."""
+        lowered = buf.lower() if self.nocase else buf
+        found = set()
+        for idx, rx, nocase in self.patterns:
+            for m in rx.finditer(lowered if nocase else buf, 0, end):
+                start = buf.rfind(b"\n", 0, m.start()) + 1
+                found.add((start, idx, buf.find(b"\n", m.end(), end)))
+        return sorted(found)
+
+    def extract(self, idx: int, line: bytes) -> Dict[str, str]:
+        rx = self.fields[idx]
+        m = rx.search(line) if rx else None
+        if not m:
+            return {}
+        return {k: v.decode("utf-8", "replace") for k, v in m.groupdict().items() if v}
+
+
+# access-log lines start "client ident user [date]"; everything else is treated as syslog-style
+_WEB_LINE = re.compile(rb"^\S+ \S+ \S+ \[[^\]\n]+\] \"")
+_SYSLOG_LINE = re.compile(rb"^(?:[A-Z][a-z]{2} [ \d]\d \d\d:\d\d:\d\d|\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)")
+SOURCES_FOR_FORMAT = {"web": ("web",), "syslog": ("auth", "syslog"), None: ("auth", "syslog", "web")}
+
+
+def detect_format(head: bytes) -> Optional[str]:
+    """'web' or 'syslog' from the first line of a log, None when it is neither."""
+    line = head.split(b"\n", 1)[0]
+    if _WEB_LINE.match(line):
+        return "web"
+    if _SYSLOG_LINE.match(line):
+        return "syslog"
+    return None
+
+
+# Sliding-window detections fed by rule hits. "key" / "distinct" name fields
+# pulled out by the rules' "fields" regexes; an alert is raised when a key
+# reaches "threshold" events (or distinct values) within "window" seconds.
+WINDOW_RULES: List[Dict[str, Any]] = [
+    {"id": "brute_force", "title": "Failed-login burst", "severity": "high",
+     "rules": ("ssh_failed_password",), "key": "ip", "window": 60, "threshold": 10},
+    {"id": "web_404_burst", "title": "404 burst", "severity": "medium",
+     "rules": ("web_404",), "key": "ip", "window": 60, "threshold": 30},
+    {"id": "username_spray", "title": "Many usernames tried from one IP", "severity": "high",
+     "rules": ("ssh_failed_password", "ssh_invalid_user"), "key": "ip", "distinct": "user",
+     "window": 600, "threshold": 5},
+]
+
+
+class WindowCounter:
+    """
+    Count-min sketch over a sliding time window: a ring of `buckets`
+    sub-window tables (depth x width 32-bit counters), zeroed as they
+    expire, so memory is fixed however many keys or events arrive. A
+    running total of the tables gives a cheap upper bound in `depth`
+    lookups; only when that bound reaches `at_least` is the tighter sum of
+    per-bucket minimums computed. Expiring buckets are subtracted from the
+    total via the cells they touched (busy buckets trigger a rebuild).
+    add() uses conservative update; counts are never under-estimated and
+    over-estimate only on hash collisions. Events older than the window
+    are ignored.
+    """
+
+    def __init__(self, window: float, buckets: int = 6, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.window = window
+        self.buckets = buckets
+        self.span = window / buckets
+        self.width = width
+        self.depth = depth
+        self._zero = bytes(4 * width * depth)
+        self._tables = [array("I", self._zero) for _ in range(buckets)]
+        self._total = array("I", self._zero)
+        # cells made non-zero per bucket, None once a bucket is too busy to track (rebuild on expiry)
+        self._touched: List[Optional[List[int]]] = [[] for _ in range(buckets)]
+        self._touched_max = width * depth // 8
+        self._head: Optional[int] = None      # epoch (t // span) of the newest bucket
+
+    def _cells(self, key) -> List[int]:
+        h = hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        w = self.width
+        return [r * w + (h1 + r * h2) % w for r in range(self.depth)]
+
+    def _clear(self, slot: int):
+        table, touched, total = self._tables[slot], self._touched[slot], self._total
+        self._tables[slot] = array("I", self._zero)
+        self._touched[slot] = []
+        if touched is None:
+            self._total = array("I", map(sum, zip(*self._tables)))
+        else:
+            for c in touched:
+                total[c] -= table[c]
+
+    def _slot(self, t: float) -> Optional[int]:
+        epoch = int(t // self.span)
+        if self._head is None:
+            self._head = epoch
+        elif epoch > self._head:
+            for e in range(max(self._head + 1, epoch - self.buckets + 1), epoch + 1):
+                self._clear(e % self.buckets)
+            self._head = epoch
+        elif epoch <= self._head - self.buckets:
+            return None
+        return epoch % self.buckets
+
+    def _estimate(self, cells: List[int], at_least: int) -> int:
+        bound = min(map(self._total.__getitem__, cells))
+        if bound < at_least:
+            return bound
+        return sum(min(map(table.__getitem__, cells)) for table in self._tables)
+
+    def _add_at(self, slot: int, cells: List[int], n: int, at_least: int) -> int:
+        table, total, touched = self._tables[slot], self._total, self._touched[slot]
+        new = min(map(table.__getitem__, cells)) + n
+        for c in cells:
+            old = table[c]
+            if old < new:
+                if not old and touched is not None:
+                    touched.append(c)
+                table[c] = new
+                total[c] += new - old
+        if touched is not None and len(touched) > self._touched_max:
+            self._touched[slot] = None
+        return self._estimate(cells, at_least)
+
+    def add(self, key, t: float, n: int = 1, at_least: int = 0) -> Optional[int]:
+        """
+        Count n events for key at time t; returns the key's count over the
+        window ending at t (only an upper bound when below at_least).
+        """
+        slot = self._slot(t)
+        if slot is None:
+            return None
+        return self._add_at(slot, self._cells(key), n, at_least)
+
+    def estimate(self, key) -> int:
+        return self._estimate(self._cells(key), 0)
+
+
+class WindowDistinct(WindowCounter):
+    """
+    Distinct values per key over a sliding window. Each (key, value) pair
+    is counted once, in the bucket where it was last seen: a Bloom filter
+    whose positions hold the epoch that last set them gives that bucket,
+    and a pair seen again is moved from it to the current bucket. So
+    expiring a bucket only drops pairs not seen since. Bucket tables get
+    plain (not conservative) count-min updates so moves can decrement.
+    Bloom collisions can make a new pair look already seen, or move a pair
+    out of the wrong bucket; both can only under-count, and are rare at the
+    default sizes.
+    """
+
+    def __init__(self, window: float, buckets: int = 10, bits: int = BLOOM_BITS, hashes: int = BLOOM_HASHES, **sketch):
+        super().__init__(window, buckets, **sketch)
+        self.bits = bits
+        self.hashes = hashes
+        self._stamps = array("I", bytes(4 * bits))     # epoch + 1 of the last sighting, 0 = never
+
+    def _bump(self, slot: int, cells: List[int], delta: int):
+        table, total, touched = self._tables[slot], self._total, self._touched[slot]
+        for c in cells:
+            old = table[c]
+            if delta < 0 and not old:
+                continue
+            if not old and touched is not None:
+                touched.append(c)
+            table[c] = old + delta
+            total[c] += delta
+        if touched is not None and len(touched) > self._touched_max:
+            self._touched[slot] = None
+
+    def add_distinct(self, key, value, t: float, at_least: int = 0) -> Optional[int]:
+        """Record value for key at time t; returns the number of distinct values for key in the window."""
+        slot = self._slot(t)
+        if slot is None:
+            return None
+        epoch = int(t // self.span)
+        cells = self._cells(key)
+        h = hash((key, value))
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        positions = [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+        stamps = self._stamps
+        last = min(map(stamps.__getitem__, positions)) - 1
+        if last < epoch:
+            if last > self._head - self.buckets:
+                self._bump(last % self.buckets, cells, -1)
+            for p in positions:
+                if stamps[p] <= epoch:
+                    stamps[p] = epoch + 1
+            self._bump(slot, cells, 1)
+        return self._estimate(cells, at_least)
+
+
+class TopK:
+    """The k keys with the highest reported counts (e.g. window peaks), in O(k) memory."""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.items: Dict[Any, int] = {}
+        self._floor = 0           # lower bound of the smallest kept count; a cheap pre-check
+
+    def offer(self, key, count: int):
+        items = self.items
+        if key in items:
+            if count > items[key]:
+                items[key] = count
+            return
+        if len(items) < self.k:
+            items[key] = count
+            return
+        if count <= self._floor:
+            return
+        victim = min(items, key=items.get)
+        if count > items[victim]:
+            del items[victim]
+            items[key] = count
+        self._floor = min(items.values())
+
+    def admits(self, key) -> int:
+        """Smallest count for key that offer() could keep (0: any)."""
+        if key in self.items or len(self.items) < self.k:
+            return 0
+        return self._floor + 1
+
+    def top(self) -> List[Tuple[Any, int]]:
+        return sorted(self.items.items(), key=lambda kv: -kv[1])
+
+
+class WindowDetector:
+    """One WINDOW_RULES entry applied to the events of a single log source."""
+
+    def __init__(self, spec: Dict[str, Any], path: str):
+        self.spec = spec
+        self.path = path
+        self.window = spec["window"]
+        self.threshold = spec["threshold"]
+        self.distinct = spec.get("distinct")
+        self.counter = WindowDistinct(self.window) if self.distinct else WindowCounter(self.window)
+        self.top = TopK()
+        self.events = 0
+        self.alerts: List[Dict[str, Any]] = []
+        self.suppressed = 0
+        self._open: Dict[str, Dict[str, Any]] = {}    # key -> alert still inside its window
+
+    def add(self, fields: Dict[str, str], t: float):
+        key = fields.get(self.spec["key"])
+        if not key:
+            return
+        # counts that can neither alert nor enter the top list may stay rough
+        at_least = min(self.threshold, self.top.admits(key))
+        if self.distinct:
+            value = fields.get(self.distinct)
+            if not value:
+                return
+            n = self.counter.add_distinct(key, value, t, at_least)
+        else:
+            n = self.counter.add(key, t, at_least=at_least)
+        if n is None:
+            return
+        self.events += 1
+        self.top.offer(key, n)
+        if n >= self.threshold:
+            self._alert(key, n, t)
+
+    def _alert(self, key: str, n: int, t: float):
+        alert = self._open.get(key)
+        if alert is not None and t - alert["last"] <= self.window:
+            alert["last"] = t
+            alert["peak"] = max(alert["peak"], n)
+            return
+        if len(self._open) >= MAX_ALERTS:
+            self._open = {k: a for k, a in self._open.items() if t - a["last"] <= self.window}
+        if len(self.alerts) >= MAX_ALERTS:
+            self.suppressed += 1
+            return
+        alert = {"key": key, "path": self.path, "first": t, "last": t, "peak": n}
+        self.alerts.append(alert)
+        self._open[key] = alert
+
+
+_MONTHS = {m: i for i, m in enumerate(
+    (b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec"), 1)}
+
+
+class LineClock:
+    """
+    Event time (epoch seconds) of a syslog ("Oct 17 10:00:00", year inferred),
+    ISO-8601 or access-log ("[17/Oct/2026:10:00:14 +0000]") line. Zone-less
+    times are taken as-is (only distances between events matter). Consecutive
+    lines usually share a timestamp, so the last parse is reused.
+    """
+
+    def __init__(self, now: Optional[float] = None):
+        self._now = now or time.time()
+        self._year = time.gmtime(self._now).tm_year
+        self._last_raw: Optional[bytes] = None
+        self._last_t: Optional[float] = None
+
+    def parse(self, line: bytes) -> Optional[float]:
+        if line[:3] in _MONTHS:
+            raw = line[:15]
+        elif line[:1].isdigit() and line[4:5] == b"-" and line[10:11] == b"T":
+            raw = line[:19]
+        else:
+            i = line.find(b"[")
+            if i < 0:
+                return None
+            raw = line[i + 1:i + 27]
+        if raw != self._last_raw:
+            self._last_raw, self._last_t = raw, self._convert(raw)
+        return self._last_t
+
+    def _convert(self, raw: bytes) -> Optional[float]:
+        try:
+            month = _MONTHS.get(raw[:3])
+            if month:
+                day, hh, mm, ss = int(raw[4:6]), int(raw[7:9]), int(raw[10:12]), int(raw[13:15])
+                t = timegm((self._year, month, day, hh, mm, ss))
+                return t if t <= self._now + 86400 else timegm((self._year - 1, month, day, hh, mm, ss))
+            if raw[4:5] == b"-":
+                return timegm(datetime.fromisoformat(raw.decode()).timetuple())
+            # 17/Oct/2026:10:00:14 +0000
+            t = timegm((int(raw[7:11]), _MONTHS[raw[3:6]], int(raw[0:2]),
+                        int(raw[12:14]), int(raw[15:17]), int(raw[18:20])))
+            zone = raw[21:26]
+            if len(zone) == 5 and zone[:1] in b"+-":
+                offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+                t -= offset if zone[:1] == b"+" else -offset
+            return t
+        except (ValueError, KeyError, IndexError):
+            return None
+
+
+class LogState:
+    """
+    On-disk (SQLite) record of how far each log file has been analyzed: byte
+    offset of the last complete line, plus device/inode and a hash of the
+    first bytes so rotation and truncation can be told apart from growth.
+    Safe to share between Flask worker threads.
+    """
+
+    def __init__(self, path: str = STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " dev INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " head_len INTEGER NOT NULL,"
+            " head_hash TEXT NOT NULL,"
+            " scanned_at REAL NOT NULL)"
+        )
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT dev, inode, offset, size, head_len, head_hash, scanned_at"
+                                     " FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("dev", "inode", "offset", "size", "head_len", "head_hash", "scanned_at"), row))
+
+    def put(self, path: str, dev: int, inode: int, offset: int, size: int, head_len: int, head_hash: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files (path, dev, inode, offset, size, head_len, head_hash, scanned_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, dev, inode, offset, size, head_len, head_hash, time.time()),
+            )
+
+    def reset(self, paths: Optional[Iterable[str]] = None):
+        """Forget offsets (for the given paths, or all) so the next scan starts from the beginning."""
+        with self._lock:
+            if paths is None:
+                self._conn.execute("DELETE FROM files")
+            else:
+                self._conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_state: Optional[LogState] = None
+_default_lock = threading.Lock()
+
+
+def get_log_state() -> LogState:
+    """Process-wide offset store at LOGSENTINEL_STATE_PATH."""
+    global _default_state
+    with _default_lock:
+        if _default_state is None:
+            _default_state = LogState()
+        return _default_state
+
+
+def allowed_log_path(path: str, roots: Iterable[str] = LOG_ROOTS) -> bool:
+    real = os.path.realpath(path)
+    return any(real == r or real.startswith(r.rstrip(os.sep) + os.sep) for r in map(os.path.realpath, roots))
+
+
+def default_log_paths() -> List[str]:
+    return [p for p in DEFAULT_LOGS if os.path.isfile(p)]
+
+
+def _head(f, length: int = HEAD_BYTES) -> bytes:
+    f.seek(0)
+    return f.read(length)
+
+
+def _find_rotated(path: str, dev: int, inode: int) -> Optional[str]:
+    """The renamed predecessor of path (path.1, path.0, path-DATE) if it still has the recorded inode."""
+    for cand in [path + ".1", path + ".0"] + sorted(glob.glob(glob.escape(path) + "-*"), reverse=True):
+        try:
+            st = os.stat(cand)
+        except OSError:
+            continue
+        if st.st_ino == inode and st.st_dev == dev:
+            return cand
+    return None
+
+
+class LogSentinel:
+    """
+    Streaming analyzer for auth, syslog and web access logs.
+
+    Files are read in CHUNK_SIZE blocks and each block is swept by the
+    compiled RuleSet, so memory stays bounded whatever the file size.
+    Per-file byte offsets are saved in LogState and a re-run only reads
+    lines appended since the last one. A rotated file (new inode) has the
+    unread tail of its predecessor finished first when it can still be
+    found next to it; a truncated file is read again from the start.
+    .gz logs are read whole, once.
+
+    Hits of the rules named in WINDOW_RULES also feed per-file sliding-window
+    detectors (WindowCounter / WindowDistinct sketches with a TopK of peak
+    offenders), whose memory does not grow with the number of events or IPs.
+    Windows start empty on each run.
+    """
+
+    def __init__(self, paths: Iterable[str], state: Optional[LogState] = None,
+                 rules: Iterable[Dict[str, Any]] = RULES, windows: Iterable[Dict[str, Any]] = WINDOW_RULES,
+                 chunk_size: int = CHUNK_SIZE):
+        self.paths = list(dict.fromkeys(paths))
+        self.state = state or get_log_state()
+        self.rules = list(rules)
+        self.windows = list(windows)
+        self.chunk_size = chunk_size
+        self._rulesets: Dict[Optional[str], Tuple[RuleSet, List[int]]] = {}
+        self._counts = [0] * len(self.rules)
+        self._samples: List[List[Dict[str, Any]]] = [[] for _ in self.rules]
+        self._listeners: Dict[int, List[WindowDetector]] = {}     # rule index -> detectors of the current file
+        self._clock = LineClock()
+        self._window_totals = {w["id"]: {"events": 0, "suppressed": 0, "alerts": [], "top": TopK()}
+                               for w in self.windows}
+
+    def _ruleset(self, fmt: Optional[str]) -> Tuple[RuleSet, List[int]]:
+        """Only the rules for a file's format are swept over it (fewer passes per chunk)."""
+        if fmt not in self._rulesets:
+            wanted = [i for i, r in enumerate(self.rules) if r["source"] in SOURCES_FOR_FORMAT[fmt]]
+            self._rulesets[fmt] = (RuleSet(self.rules[i] for i in wanted), wanted)
+        return self._rulesets[fmt]
+
+    # ---------------- reading ----------------
+    def _scan_stream(self, f, path: str, fmt: Optional[str], stop: Optional[threading.Event],
+                     advance: Callable[[int], None]) -> Dict[str, int]:
+        """Scan complete lines from f's current position; returns bytes consumed, lines, overlong lines."""
+        ruleset = self._ruleset(fmt)
+        consumed = lines = overlong = 0
+        carry = b""
+        while not (stop and stop.is_set()):
+            data = f.read(self.chunk_size)
+            if not data:
+                break
+            advance(len(data))
+            buf = carry + data if carry else data
+            end = buf.rfind(b"\n") + 1
+            if end:
+                self._match(ruleset, buf, end, path)
+                lines += buf.count(b"\n", 0, end)
+                consumed += end
+            carry = buf[end:]
+            if len(carry) > MAX_LINE:
+                # skip the oversized line; matching resumes after its newline
+                consumed += len(carry)
+                overlong += 1
+                carry = b""
+                skipped = f.readline(MAX_LINE)
+                while skipped and not skipped.endswith(b"\n"):
+                    consumed += len(skipped)
+                    advance(len(skipped))
+                    skipped = f.readline(MAX_LINE)
+                consumed += len(skipped)
+                advance(len(skipped))
+        return {"bytes": consumed, "lines": lines, "overlong": overlong}
+
+    def _match(self, ruleset: Tuple[RuleSet, List[int]], buf: bytes, end: int, path: str):
+        rs, index = ruleset
+        counts, samples, listeners = self._counts, self._samples, self._listeners
+        for start, idx, stop_at in rs.hits(buf, end):
+            rule = index[idx]
+            counts[rule] += 1
+            detectors = listeners.get(rule)
+            if not detectors and len(samples[rule]) >= SAMPLES_PER_RULE:
+                continue
+            line = buf[start:stop_at]
+            fields = rs.extract(idx, line)
+            if detectors:
+                t = self._clock.parse(line)
+                if t is not None:
+                    for d in detectors:
+                        d.add(fields, t)
+            if len(samples[rule]) < SAMPLES_PER_RULE:
+                sample = {"path": path, "line": line[:SAMPLE_CHARS].decode("utf-8", "replace")}
+                sample.update(fields)
+                samples[rule].append(sample)
+
+    def _start_source(self, path: str) -> List[WindowDetector]:
+        """Fresh window detectors for one log file (a rotated predecessor counts as the same source)."""
+        rule_index = {r["id"]: i for i, r in enumerate(self.rules)}
+        detectors = [WindowDetector(spec, path) for spec in self.windows]
+        self._listeners = {}
+        for d in detectors:
+            for rule_id in d.spec["rules"]:
+                if rule_id in rule_index:
+                    self._listeners.setdefault(rule_index[rule_id], []).append(d)
+        return detectors
+
+    def _finish_source(self, detectors: List[WindowDetector]):
+        self._listeners = {}
+        for d in detectors:
+            total = self._window_totals[d.spec["id"]]
+            total["events"] += d.events
+            total["suppressed"] += d.suppressed
+            total["alerts"].extend(d.alerts)
+            for key, peak in d.top.top():
+                total["top"].offer(key, peak)
+
+    def _window_report(self) -> List[Dict[str, Any]]:
+        def stamp(t: float) -> str:
+            return datetime.utcfromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+
+        out = []
+        for spec in self.windows:
+            total = self._window_totals[spec["id"]]
+            alerts = sorted(total["alerts"], key=lambda a: -a["peak"])
+            out.append({
+                "id": spec["id"], "title": spec["title"], "severity": spec["severity"],
+                "window": spec["window"], "threshold": spec["threshold"], "distinct": spec.get("distinct"),
+                "events": total["events"], "suppressed": total["suppressed"],
+                "alerts": [{"key": a["key"], "path": a["path"], "first": stamp(a["first"]),
+                            "last": stamp(a["last"]), "peak": a["peak"]} for a in alerts],
+                "top": [{"key": k, "peak": n} for k, n in total["top"].top()],
+            })
+        return out
+
+    def _scan_file(self, path: str, stop, advance) -> Dict[str, Any]:
+        detectors = self._start_source(path)
+        try:
+            return self._scan_source(path, stop, advance)
+        finally:
+            self._finish_source(detectors)
+
+    def _scan_source(self, path: str, stop, advance) -> Dict[str, Any]:
+        entry: Dict[str, Any] = {"path": path, "status": "ok", "from": 0, "to": 0, "bytes": 0, "lines": 0, "notes": []}
+        try:
+            st = os.stat(path)
+            f = open(path, "rb")
+        except FileNotFoundError:
+            entry["status"] = "missing"
+            return entry
+        except OSError as e:
+            entry["status"] = f"error: {e.strerror or e}"
+            return entry
+
+        with f:
+            prev = self.state.get(path)
+            head = _head(f)
+            offset = 0
+            if path.endswith(".gz"):
+                if prev and (prev["dev"], prev["inode"], prev["size"]) == (st.st_dev, st.st_ino, st.st_size):
+                    entry["status"] = "unchanged"
+                    entry["from"] = entry["to"] = st.st_size
+                    return entry
+                f.seek(0)
+                with gzip.open(f) as gz:
+                    fmt = detect_format(gz.peek(HEAD_BYTES)[:HEAD_BYTES])
+                    res = self._scan_stream(gz, path, fmt, stop, lambda n: advance(0))
+                advance(st.st_size)
+                entry.update(bytes=res["bytes"], lines=res["lines"], to=st.st_size)
+                if stop and stop.is_set():
+                    # a gzip stream cannot be resumed mid-way; leave it unscanned
+                    entry["status"] = "stopped"
+                    entry["to"] = 0
+                    entry["notes"].append("stopped: archive will be read again next run")
+                    return entry
+                self.state.put(path, st.st_dev, st.st_ino, st.st_size, st.st_size, len(head),
+                               hashlib.sha1(head).hexdigest())
+                return entry
+
+            if prev:
+                if (prev["dev"], prev["inode"]) != (st.st_dev, st.st_ino):
+                    old = _find_rotated(path, prev["dev"], prev["inode"])
+                    if old:
+                        with open(old, "rb") as of:
+                            of.seek(prev["offset"])
+                            res = self._scan_stream(of, old, detect_format(head), stop, advance)
+                        entry["bytes"] += res["bytes"]
+                        entry["lines"] += res["lines"]
+                        if stop and stop.is_set():
+                            # keep tracking the old inode so the next run resumes it
+                            entry["status"] = "stopped"
+                            entry["notes"].append(f"rotated: stopped after {res['bytes']} bytes of {old}")
+                            self.state.put(path, prev["dev"], prev["inode"], prev["offset"] + res["bytes"],
+                                           prev["size"], prev["head_len"], prev["head_hash"])
+                            return entry
+                        entry["notes"].append(f"rotated: finished {res['bytes']} unread bytes of {old}")
+                    else:
+                        entry["notes"].append("rotated: previous file not found, starting new file from the top")
+                elif st.st_size < prev["offset"] or \
+                        hashlib.sha1(head[:prev["head_len"]]).hexdigest() != prev["head_hash"]:
+                    entry["notes"].append("truncated: re-reading from the start")
+                else:
+                    offset = prev["offset"]
+
+            entry["from"] = offset
+            f.seek(offset)
+            res = self._scan_stream(f, path, detect_format(head), stop, advance)
+            entry["to"] = offset + res["bytes"]
+            entry["bytes"] += res["bytes"]
+            entry["lines"] += res["lines"]
+            if res["overlong"]:
+                entry["notes"].append(f"{res['overlong']} line(s) over {MAX_LINE} bytes skipped")
+            if entry["to"] == offset and not entry["notes"]:
+                entry["status"] = "unchanged"
+            self.state.put(path, st.st_dev, st.st_ino, entry["to"], st.st_size, len(head),
+                           hashlib.sha1(head).hexdigest())
+        return entry
+
+    # ---------------- public ----------------
+    def pending_bytes(self) -> int:
+        total = 0
+        for path in self.paths:
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            prev = self.state.get(path)
+            total += size - prev["offset"] if prev and 0 <= prev["offset"] <= size else size
+        return total
+
+    def scan(self, progress: Optional[Callable] = None, stop: Optional[threading.Event] = None) -> Dict[str, Any]:
+        started = time.time()
+        total = self.pending_bytes()
+        done = 0
+
+        def advance(n: int):
+            nonlocal done
+            done += n
+            if progress:
+                progress(min(done, total), total)
+
+        files = []
+        for path in self.paths:
+            if stop and stop.is_set():
+                break
+            if progress:
+                progress(min(done, total), total, path)
+            files.append(self._scan_file(path, stop, advance))
+
+        elapsed = time.time() - started
+        read = sum(f["bytes"] for f in files)
+        rules = [
+            {"id": r["id"], "title": r["title"], "source": r["source"], "severity": r["severity"],
+             "count": self._counts[i], "samples": self._samples[i]}
+            for i, r in enumerate(self.rules) if self._counts[i]
+        ]
+        rules.sort(key=lambda r: (SEVERITY_ORDER.get(r["severity"], 9), -r["count"]))
+        return {
+            "scanned_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "files": files,
+            "rules": rules,
+            "windows": self._window_report(),
+            "totals": {"bytes": read, "lines": sum(f["lines"] for f in files), "hits": sum(self._counts)},
+            "elapsed": round(elapsed, 2),
+            "mb_per_s": round(read / elapsed / 1e6, 1) if elapsed > 0 else None,
+        }
@@ -0,0 +1,407 @@
+# tools/metabatch.py
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from tools.metaspy import UPLOAD_SPOOL_MEMORY, HashingSpool, MetaSpyScanner
+
+CACHE_PATH = os.environ.get("METASPY_CACHE_PATH", os.path.join(tempfile.gettempdir(), "cybersentinel_metaspy.sqlite3"))
+CACHE_TTL = int(os.environ.get("METASPY_CACHE_TTL", 30 * 24 * 3600))
+BATCH_WORKERS = int(os.environ.get("METASPY_WORKERS", min(4, os.cpu_count() or 1)))
+
+MAX_BATCH_FILES = 1000
+MAX_MEMBER_SIZE = 100 * 1024 * 1024       # per extracted zip member
+MAX_ARCHIVE_SIZE = 1024 * 1024 * 1024     # total uncompressed bytes taken from one zip
+COPY_CHUNK = 1024 * 1024
+
+# metadata fields that name a person / the producing software, per file type
+AUTHOR_FIELDS = ("author", "last_modified_by", "Author", "Image Artist", "EXIF CameraOwnerName", "dc:creator")
+SOFTWARE_FIELDS = ("application", "Creator", "Producer", "Image Software", "xmp:CreatorTool", "pdf:Producer")
+
+
+class MetaCache:
+    """
+    On-disk (SQLite) cache of MetaSpy extraction results keyed by the
+    SHA-256 of the file content plus its extension (which picks the parser).
+    Only content-derived fields (type, mime, metadata) are stored.
+    Safe to share between Flask worker threads.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL):
+        self.path = path
+        self.ttl = int(ttl)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " sha256 TEXT NOT NULL,"
+            " ext TEXT NOT NULL,"
+            " analyzed_at REAL NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " PRIMARY KEY (sha256, ext))"
+        )
+
+    def get(self, sha256: str, ext: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT analyzed_at, payload FROM results WHERE sha256 = ? AND ext = ?",
+                                     (sha256, ext)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def put(self, sha256: str, ext: str, analysis: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (sha256, ext, analyzed_at, payload) VALUES (?, ?, ?, ?)",
+                (sha256, ext, time.time(), json.dumps(analysis, default=str)),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM results WHERE analyzed_at < ?", (time.time() - self.ttl,))
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[MetaCache] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_default_lock = threading.Lock()
+
+
+def get_meta_cache() -> MetaCache:
+    """Process-wide cache at METASPY_CACHE_PATH with METASPY_CACHE_TTL seconds of freshness."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = MetaCache()
+        return _default_cache
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # never fork the threaded app process (locks held by other threads would be copied):
+    # workers come from a forkserver (spawn where unavailable). Both import the __main__
+    # script as __mp_main__, so app.py keeps its background services behind a guard.
+    global _pool
+    with _default_lock:
+        if _pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=max(1, BATCH_WORKERS),
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor):
+    global _pool
+    with _default_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def _analyze(data: Optional[bytes], path: Optional[str], filename: str) -> Dict[str, Any]:
+    """Pool worker: the content-derived part of a MetaSpyScanner result."""
+    scanner = MetaSpyScanner()
+    res = scanner.analyze(data, filename) if data is not None else scanner.analyze_file(path)
+    out = {"type": res["type"], "mime": res["mime"], "metadata": res["metadata"]}
+    if res.get("error"):
+        out["error"] = res["error"]
+    return out
+
+
+# ---------------- batch inputs ----------------
+def spool_file(src, filename: str, spool_dir: Optional[str] = None, limit: Optional[int] = None,
+               fs_modified: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read a stream into a batch item, hashing it on the way. Up to
+    UPLOAD_SPOOL_MEMORY bytes are kept in memory and sent to the pool as
+    bytes; larger files go to a temporary file that analyze_batch() removes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    buf = bytearray()
+    out = path = None
+    try:
+        while True:
+            chunk = src.read(COPY_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if limit is not None and size > limit:
+                raise ValueError("too_large")
+            digest.update(chunk)
+            if out is not None:
+                out.write(chunk)
+                continue
+            buf += chunk
+            if len(buf) > UPLOAD_SPOOL_MEMORY:
+                fd, path = tempfile.mkstemp(prefix="metaspy_", suffix=os.path.splitext(filename)[1].lower(),
+                                            dir=spool_dir)
+                out = os.fdopen(fd, "wb")
+                out.write(buf)
+                buf = bytearray()
+    except BaseException:
+        if out is not None:
+            out.close()
+            os.unlink(path)
+        raise
+    item = {"filename": filename, "sha256": digest.hexdigest(), "file_size": size, "fs_modified": fs_modified}
+    if out is not None:
+        out.close()
+        item.update(path=path, temporary=True)
+    else:
+        item["data"] = bytes(buf)
+    return item
+
+
+def _upload_item(stream, filename: str, spool_dir: Optional[str]) -> Dict[str, Any]:
+    # a HashingSpool that never left memory is already hashed: just take its bytes
+    if isinstance(stream, HashingSpool) and not stream.spilled:
+        stream.seek(0)
+        return {"filename": filename, "sha256": stream.sha256, "file_size": stream.size,
+                "fs_modified": None, "data": stream.read()}
+    stream.seek(0)
+    return spool_file(stream, filename, spool_dir)
+
+
+def iter_zip(fileobj, archive_name: str, allowed_ext: Iterable[str],
+             spool_dir: Optional[str] = None, max_files: int = MAX_BATCH_FILES) -> Iterator[Dict[str, Any]]:
+    """
+    Batch items for the supported members of a zip archive, extracted one at a
+    time. Directories are skipped; unsupported, encrypted or oversized members
+    and anything past max_files / MAX_ARCHIVE_SIZE come back as error items.
+    Member names are only used for display, never as extraction paths.
+    """
+    allowed_ext = set(allowed_ext)
+    try:
+        zf = zipfile.ZipFile(fileobj)
+    except (zipfile.BadZipFile, OSError) as e:
+        yield {"filename": archive_name, "error": f"bad_zip: {e}"}
+        return
+
+    with zf:
+        count = total = 0
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            name = f"{archive_name}/{info.filename}"
+            ext = os.path.splitext(info.filename)[1].lower()
+            if ext not in allowed_ext:
+                yield {"filename": name, "error": "unsupported_type"}
+                continue
+            if count >= max_files:
+                yield {"filename": archive_name, "error": f"file_limit: only the first {max_files} files were analyzed"}
+                return
+            if info.flag_bits & 0x1:
+                yield {"filename": name, "error": "encrypted"}
+                continue
+            if info.file_size > MAX_MEMBER_SIZE:
+                yield {"filename": name, "error": "too_large"}
+                continue
+            if total + info.file_size > MAX_ARCHIVE_SIZE:
+                yield {"filename": archive_name, "error": "archive_too_large: remaining members skipped"}
+                return
+            count += 1
+            total += info.file_size
+            try:
+                with zf.open(info) as src:
+                    item = spool_file(src, name, spool_dir, limit=MAX_MEMBER_SIZE,
+                                      fs_modified=datetime(*info.date_time).isoformat())
+            except (zipfile.BadZipFile, NotImplementedError, ValueError, OSError) as e:
+                item = {"filename": name, "error": f"extract_error: {e}"}
+            yield item
+
+
+def iter_uploads(uploads, allowed_ext: Iterable[str], spool_dir: Optional[str] = None,
+                 max_files: int = MAX_BATCH_FILES) -> Iterator[Dict[str, Any]]:
+    """Batch items for (filename, stream) uploads; .zip uploads are expanded with iter_zip()."""
+    allowed_ext = set(allowed_ext)
+    count = 0
+    for filename, stream in uploads:
+        if count >= max_files:
+            yield {"filename": filename, "error": f"file_limit: only the first {max_files} files were analyzed"}
+            return
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == ".zip":
+            for item in iter_zip(stream, filename, allowed_ext, spool_dir, max_files - count):
+                count += "error" not in item
+                yield item
+        elif ext in allowed_ext:
+            count += 1
+            yield _upload_item(stream, filename, spool_dir)
+        else:
+            yield {"filename": filename, "error": "unsupported_type"}
+
+
+# ---------------- analysis ----------------
+def _discard(item: Dict[str, Any]):
+    if item.get("temporary") and item.get("path"):
+        try:
+            os.unlink(item["path"])
+        except OSError:
+            pass
+
+
+def _result(item: Dict[str, Any], analysis: Optional[Dict[str, Any]], cached: bool = False,
+            duplicate: bool = False) -> Dict[str, Any]:
+    out = {
+        "filename": item["filename"],
+        "sha256": item.get("sha256"),
+        "file_size": item.get("file_size"),
+        "fs_modified": item.get("fs_modified"),
+        "type": "other",
+        "mime": None,
+        "metadata": {},
+        "cached": cached,
+        "duplicate": duplicate,
+    }
+    if analysis:
+        out.update(analysis)
+    if item.get("error"):
+        out["error"] = item["error"]
+    return out
+
+
+def analyze_batch(items: Iterable[Dict[str, Any]], cache: Optional[MetaCache] = None,
+                  max_inflight: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Analyze batch items (from iter_uploads / iter_zip) on the process pool,
+    yielding one result per item as extraction completes (not in input order).
+
+    Results are cached by SHA-256, so known content is never parsed again and
+    identical files within the batch share one parse (marked "duplicate").
+    At most max_inflight files are read ahead of the pool, and temporary
+    files are deleted as soon as they are done with.
+    """
+    cache = cache or get_meta_cache()
+    max_inflight = max_inflight or 2 * max(1, BATCH_WORKERS)
+    pool = _get_pool()
+    waiting: Dict[tuple, List[Dict[str, Any]]] = {}    # (sha256, ext) -> items sharing one parse
+    futures: Dict[Any, tuple] = {}                       # future -> (key, pool it was submitted to)
+
+    def drain(return_when):
+        nonlocal pool
+        done, _ = wait(list(futures), return_when=return_when)
+        for fut in done:
+            key, source = futures.pop(fut)
+            group = waiting.pop(key)
+            try:
+                analysis = fut.result()
+            except BrokenProcessPool:
+                # only the crashed pool is replaced; later futures from it land here too
+                _reset_pool(source)
+                pool = _get_pool()
+                analysis = {"error": "worker_crashed"}
+            except Exception as e:
+                analysis = {"error": f"analysis_error: {e}"}
+            else:
+                if not analysis.get("error"):
+                    cache.put(key[0], key[1], analysis)
+            for i, item in enumerate(group):
+                _discard(item)
+                yield _result(item, analysis, duplicate=i > 0)
+
+    try:
+        for item in items:
+            if item.get("error"):
+                yield _result(item, None)
+                continue
+            key = (item["sha256"], os.path.splitext(item["filename"])[1].lower())
+            if key in waiting:
+                _discard(item)
+                waiting[key].append(item)
+                continue
+            analysis = cache.get(*key)
+            if analysis is not None:
+                _discard(item)
+                yield _result(item, analysis, cached=True)
+                continue
+
+            waiting[key] = [item]
+            args = (item.pop("data", None), item.get("path"), item["filename"])
+            try:
+                futures[pool.submit(_analyze, *args)] = (key, pool)
+            except BrokenProcessPool:
+                _reset_pool(pool)
+                pool = _get_pool()
+                futures[pool.submit(_analyze, *args)] = (key, pool)
+            while len(futures) >= max_inflight:
+                yield from drain(FIRST_COMPLETED)
+        while futures:
+            yield from drain(FIRST_COMPLETED)
+    finally:
+        for fut in futures:
+            fut.cancel()
+        for group in waiting.values():
+            for item in group:
+                _discard(item)
+
+
+# ---------------- aggregate view ----------------
+class BatchSummary:
+    """Running aggregate over batch results: distinct authors/software, GPS hits, per-type counts."""
+
+    def __init__(self):
+        self.files = 0
+        self.errors = 0
+        self.cached = 0
+        self.duplicates = 0
+        self.by_type: Counter = Counter()
+        self.authors: Dict[str, List[str]] = {}
+        self.software: Dict[str, List[str]] = {}
+        self.gps: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _fields(meta: Dict[str, Any], names) -> List[str]:
+        xmp = meta.get("xmp") if isinstance(meta.get("xmp"), dict) else {}
+        values = []
+        for name in names:
+            value = meta.get(name) or xmp.get(name)
+            if value and str(value).strip() and str(value).strip() not in values:
+                values.append(str(value).strip())
+        return values
+
+    def add(self, result: Dict[str, Any]):
+        self.files += 1
+        if result.get("error"):
+            self.errors += 1
+            return
+        self.cached += bool(result.get("cached"))
+        self.duplicates += bool(result.get("duplicate"))
+        self.by_type[result.get("type") or "other"] += 1
+
+        meta = result.get("metadata") or {}
+        name = result["filename"]
+        for value in self._fields(meta, AUTHOR_FIELDS):
+            self.authors.setdefault(value, []).append(name)
+        for value in self._fields(meta, SOFTWARE_FIELDS):
+            self.software.setdefault(value, []).append(name)
+        if meta.get("gps_lat") is not None and meta.get("gps_lon") is not None:
+            self.gps.append({"filename": name, "lat": meta["gps_lat"], "lon": meta["gps_lon"]})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "errors": self.errors,
+            "cached": self.cached,
+            "duplicates": self.duplicates,
+            "by_type": dict(self.by_type),
+            "authors": [{"name": k, "files": v} for k, v in sorted(self.authors.items())],
+            "software": [{"name": k, "files": v} for k, v in sorted(self.software.items())],
+            "gps": self.gps,
+        }
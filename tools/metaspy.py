@@ -1,8 +1,12 @@
 # tools/metaspy.py
+import hashlib
+import io
 import os
+import tempfile
 import time
 import mimetypes
-from typing import Dict, Any
+import zlib
+from typing import Any, BinaryIO, Dict, Optional, Union
 from datetime import datetime
 
 import exifread           # pip install exifread
@@ -10,12 +14,82 @@ from PIL import Image     # pip install Pillow
 import PyPDF2             # pip install PyPDF2
 import docx               # pip install python-docx
 
+from tools.docmeta import MetadataUnsupported, docx_properties, image_segments, parse_xmp, pdf_info
+
+
+UPLOAD_SPOOL_MEMORY = int(os.environ.get("UPLOAD_SPOOL_MEMORY", 8 * 1024 * 1024))
+HASH_CHUNK = 1024 * 1024
+
+IMAGE_EXT = (".jpg", ".jpeg", ".tiff", ".tif", ".png", ".heic")
+
+
+class HashingSpool(tempfile.SpooledTemporaryFile):
+    """
+    Upload buffer that stays in memory up to max_size bytes and then spills
+    to an anonymous temporary file (removed when closed). Everything written
+    is SHA-256 hashed on the way in, so the digest costs no extra read.
+    """
+
+    def __init__(self, max_size: int = UPLOAD_SPOOL_MEMORY, dir: Optional[str] = None):
+        super().__init__(max_size=max_size, mode="w+b", dir=dir)
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def spilled(self) -> bool:
+        return self._rolled
+
+
+def spool(src, max_size: int = UPLOAD_SPOOL_MEMORY, dir: Optional[str] = None) -> HashingSpool:
+    """Copy a readable stream into a HashingSpool (rewound for reading)."""
+    buf = HashingSpool(max_size, dir)
+    while True:
+        chunk = src.read(HASH_CHUNK)
+        if not chunk:
+            break
+        buf.write(chunk)
+    buf.seek(0)
+    return buf
+
+
+def purge_stale_uploads(directory: str, max_age: int = 3600) -> int:
+    """Delete metaspy_* spool files older than max_age seconds (left by crashes or older versions)."""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.startswith("metaspy_") and entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
 
 class MetaSpyScanner:
     """
     File metadata extractor.
     analyze_file(path) -> dict with metadata fields.
-    Supports: JPEG/JPG/TIFF/PNG (EXIF), PDF (PyPDF2), DOCX (python-docx).
+    analyze(data, filename) does the same for bytes or a binary file object
+    (e.g. an upload stream), without touching disk.
+    Supports: JPEG/JPG/TIFF/PNG (EXIF, XMP), PDF (Info dict), DOCX (core + app props).
+
+    Only the metadata-bearing parts of a file are read (see tools/docmeta);
+    PyPDF2 / python-docx are used as a fallback when that fast path cannot
+    handle a file (e.g. encrypted PDFs).
     """
 
     def __init__(self):
@@ -46,14 +120,56 @@ class MetaSpyScanner:
         except Exception as e:
             out["metadata"]["fs_error"] = str(e)
 
-        mime, _ = mimetypes.guess_type(path)
+        with open(path, "rb") as f:
+            self._extract(f, path, out)
+        return out
+
+    def analyze(self, data: Union[bytes, bytearray, memoryview, BinaryIO], filename: str) -> Dict[str, Any]:
+        """
+        Analyze in-memory bytes or a seekable binary file object; filename picks
+        the parser. The SHA-256 is taken from a HashingSpool when available,
+        otherwise computed here.
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            f = io.BytesIO(data)
+            size, sha256 = len(data), hashlib.sha256(data).hexdigest()
+        else:
+            f = data
+            if isinstance(f, HashingSpool):
+                size, sha256 = f.size, f.sha256
+            else:
+                digest = hashlib.sha256()
+                size = 0
+                f.seek(0)
+                for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                sha256 = digest.hexdigest()
+        out: Dict[str, Any] = {
+            "filename": os.path.basename(filename),
+            "path": None,
+            "file_size": size,
+            "sha256": sha256,
+            "mime": None,
+            "fs_created": None,
+            "fs_modified": None,
+            "type": "other",
+            "metadata": {},
+        }
+        self._extract(f, filename, out)
+        return out
+
+    def _extract(self, f: BinaryIO, name: str, out: Dict[str, Any]):
+        """Fill type / mime / metadata in out from the open file f (parser chosen by name)."""
+        mime, _ = mimetypes.guess_type(name)
         out["mime"] = mime or "application/octet-stream"
-        ext = os.path.splitext(path)[1].lower()
+        ext = os.path.splitext(name)[1].lower()
 
-        if ext in (".jpg", ".jpeg", ".tiff", ".tif", ".png", ".heic"):
+        if ext in IMAGE_EXT:
             out["type"] = "image"
             try:
-                meta = self._extract_image_exif(path)
+                f.seek(0)
+                meta = self._extract_image_exif(f)
                 out["metadata"].update(meta)
             except Exception as e:
                 out["metadata"]["error"] = f"exif_error: {e}"
@@ -61,7 +177,8 @@ class MetaSpyScanner:
         elif ext == ".pdf":
             out["type"] = "pdf"
             try:
-                meta = self._extract_pdf_metadata(path)
+                f.seek(0)
+                meta = self._extract_pdf_metadata(f)
                 out["metadata"].update(meta)
             except Exception as e:
                 out["metadata"]["error"] = f"pdf_error: {e}"
@@ -69,7 +186,8 @@ class MetaSpyScanner:
         elif ext in (".docx",):
             out["type"] = "docx"
             try:
-                meta = self._extract_docx_coreprops(path)
+                f.seek(0)
+                meta = self._extract_docx_coreprops(f)
                 out["metadata"].update(meta)
             except Exception as e:
                 out["metadata"]["error"] = f"docx_error: {e}"
@@ -77,16 +195,28 @@ class MetaSpyScanner:
             if out["mime"] and out["mime"].startswith("image/"):
                 out["type"] = "image"
                 try:
-                    meta = self._extract_image_exif(path)
+                    f.seek(0)
+                    meta = self._extract_image_exif(f)
                     out["metadata"].update(meta)
                 except Exception:
                     pass
 
-        return out
-
-    def _extract_image_exif(self, path: str) -> Dict[str, Any]:
+    def _extract_image_exif(self, f: BinaryIO) -> Dict[str, Any]:
         meta = {}
-        with open(path, "rb") as f:
+        head = f.read(8)
+        kind = "jpeg" if head.startswith(b"\xff\xd8") else "png" if head.startswith(b"\x89PNG") else None
+        try:
+            # only the EXIF / XMP segments in front of the image data are read
+            exif, xmp = image_segments(f, kind) if kind else (None, None)
+        except MetadataUnsupported:
+            kind = None
+        if kind:
+            tags = exifread.process_file(io.BytesIO(exif), details=False) if exif else {}
+            if xmp:
+                meta["xmp"] = parse_xmp(xmp)
+        else:
+            # TIFF / HEIC: exifread follows IFD offsets with seeks
+            f.seek(0)
             tags = exifread.process_file(f, details=False)
         for k, v in tags.items():
             try:
@@ -136,20 +266,33 @@ class MetaSpyScanner:
         except Exception:
             return None
 
-    def _extract_pdf_metadata(self, path: str) -> Dict[str, Any]:
+    def _extract_pdf_metadata(self, f: BinaryIO) -> Dict[str, Any]:
+        try:
+            return pdf_info(f)
+        except (MetadataUnsupported, ValueError, KeyError, IndexError, zlib.error):
+            f.seek(0)
+            return self._extract_pdf_metadata_full(f)
+
+    def _extract_pdf_metadata_full(self, f) -> Dict[str, Any]:
         meta = {}
-        with open(path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            info = reader.metadata
-            if info:
-                for k, v in info.items():
-                    key = k.strip("/") if isinstance(k, str) else str(k)
-                    meta[key] = str(v)
+        reader = PyPDF2.PdfReader(f)
+        info = reader.metadata
+        if info:
+            for k, v in info.items():
+                key = k.strip("/") if isinstance(k, str) else str(k)
+                meta[key] = str(v)
         return meta
 
-    def _extract_docx_coreprops(self, path: str) -> Dict[str, Any]:
+    def _extract_docx_coreprops(self, f: BinaryIO) -> Dict[str, Any]:
+        try:
+            return docx_properties(f)
+        except MetadataUnsupported:
+            f.seek(0)
+            return self._extract_docx_coreprops_full(f)
+
+    def _extract_docx_coreprops_full(self, f) -> Dict[str, Any]:
         meta = {}
-        doc = docx.Document(path)
+        doc = docx.Document(f)
         props = doc.core_properties
         meta["author"] = props.author
         meta["title"] = props.title
@@ -0,0 +1,270 @@
+# tools/outbox.py
+import json
+import os
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+from email.message import Message
+from email.utils import getaddresses, parseaddr
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PATH = os.environ.get("OUTBOX_PATH", os.path.join(tempfile.gettempdir(), "cybersentinel_outbox.sqlite3"))
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 5.0        # seconds; doubles per failed attempt
+BACKOFF_MAX = 15 * 60
+IDLE_CLOSE = 60.0         # close the SMTP connection after this long without mail
+SMTP_TIMEOUT = 20
+KEEP_SENT = 24 * 3600     # sent/failed rows are kept this long for status lookups
+LEASE = 5 * 60            # a claimed row goes back to the queue if its sender dies before this
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+
+def _permanent(error: smtplib.SMTPException) -> bool:
+    """5xx rejections of the message or all its recipients will not succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    return 500 <= getattr(error, "smtp_code", 0) < 600
+
+
+class Outbox:
+    """
+    Durable outgoing-mail queue with a single background sender.
+
+    send() stores the message in SQLite and returns at once. The sender
+    thread delivers queued mail over one SMTP connection that it keeps open
+    (and reopens when the relay drops it), retrying transient failures with
+    exponential backoff. Permanent 5xx rejections and messages that run out
+    of attempts are marked failed. Mail queued before a restart is picked up
+    when the next Outbox on the same file starts.
+
+    Several Outboxes may share one file (reloader parent and child, several
+    workers): each row is claimed with a lease by a single conditional
+    UPDATE before it is sent, so only one of them sends it.
+    """
+
+    def __init__(self, server: str, port: int = 587, sender: str = "", password: str = "",
+                 starttls: bool = True, path: str = DEFAULT_PATH, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX, idle_close: float = IDLE_CLOSE):
+        self.server = server
+        self.port = int(port)
+        self.sender = sender
+        self.password = password
+        self.starttls = starttls
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_close = idle_close
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closing = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created REAL NOT NULL,"
+            " next_attempt REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL,"
+            " sender TEXT NOT NULL,"
+            " recipients TEXT NOT NULL,"
+            " message TEXT NOT NULL,"
+            " last_error TEXT,"
+            " lease_until REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        if "lease_until" not in columns:
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN lease_until REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt)")
+
+    # ---------------- queueing ----------------
+    def send(self, msg: Message, recipients: Optional[List[str]] = None) -> int:
+        """Queue msg for delivery (to its To/Cc/Bcc unless recipients given); returns the queue id."""
+        if recipients is None:
+            recipients = [addr for _, addr in getaddresses(msg.get_all("To", []) + msg.get_all("Cc", [])
+                                                           + msg.get_all("Bcc", [])) if addr]
+        if not recipients:
+            raise ValueError("message has no recipients")
+        sender = parseaddr(msg.get("From") or self.sender)[1]
+        del msg["Bcc"]
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (created, next_attempt, status, sender, recipients, message)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (now, now, QUEUED, sender, json.dumps(recipients), msg.as_string()),
+            )
+        self.start()
+        self._wake.set()
+        return cur.lastrowid
+
+    def status(self, message_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT status, attempts, last_error, created FROM outbox WHERE id = ?",
+                                     (message_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": message_id, "status": row[0], "attempts": row[1], "error": row[2], "created": row[3]}
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)",
+                                      (QUEUED, SENDING)).fetchone()[0]
+
+    # ---------------- sender thread ----------------
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closing.clear()
+                self._thread = threading.Thread(target=self._run, name="outbox", daemon=True)
+                self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the sender (queued mail stays on disk) and close the SMTP connection."""
+        self._closing.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._disconnect()
+
+    def _due(self):
+        now = time.time()
+        with self._lock:
+            # rows whose sender died mid-delivery are up for grabs again
+            self._conn.execute("UPDATE outbox SET status = ?, lease_until = NULL WHERE status = ? AND lease_until < ?",
+                               (QUEUED, SENDING, now))
+            return self._conn.execute(
+                "SELECT id, attempts, sender, recipients, message FROM outbox"
+                " WHERE status = ? AND next_attempt <= ? ORDER BY next_attempt, id LIMIT 50",
+                (QUEUED, now),
+            ).fetchall()
+
+    def _claim(self, message_id: int) -> bool:
+        """Lease a queued row to this sender; False if another Outbox got it first."""
+        with self._lock:
+            cur = self._conn.execute("UPDATE outbox SET status = ?, lease_until = ? WHERE id = ? AND status = ?",
+                                     (SENDING, time.time() + LEASE, message_id, QUEUED))
+        return cur.rowcount == 1
+
+    def _next_wakeup(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(CASE WHEN status = ? THEN next_attempt ELSE lease_until END) FROM outbox"
+                " WHERE status IN (?, ?)", (QUEUED, QUEUED, SENDING)).fetchone()
+        return row[0]
+
+    def _run(self):
+        try:
+            self._purge()
+        except sqlite3.Error:
+            pass
+        while not self._closing.is_set():
+            self._wake.clear()
+            try:
+                due = self._due()
+            except sqlite3.Error:
+                due = []
+            for message_id, attempts, sender, recipients, message in due:
+                if self._closing.is_set():
+                    break
+                try:
+                    if self._claim(message_id):
+                        self._deliver(message_id, attempts, sender, json.loads(recipients), message)
+                except Exception as e:
+                    # keep the sender alive; the row is retried, or re-queued when its lease runs out
+                    self._disconnect()
+                    try:
+                        self._retry(message_id, attempts, e)
+                    except sqlite3.Error:
+                        pass
+
+            try:
+                next_at = self._next_wakeup()
+            except sqlite3.Error:
+                next_at = time.time() + self.backoff_base
+            wait = self.idle_close if next_at is None else max(0.0, next_at - time.time())
+            if self._smtp is not None:
+                idle_left = self._last_used + self.idle_close - time.time()
+                if idle_left <= 0:
+                    self._disconnect()
+                else:
+                    wait = min(wait, idle_left)
+            self._wake.wait(wait)
+
+    def _deliver(self, message_id: int, attempts: int, sender: str, recipients: List[str], message: str):
+        try:
+            try:
+                self._connection().sendmail(sender, recipients, message)
+            except smtplib.SMTPServerDisconnected:
+                # the relay closed our idle connection; one fresh try before counting a failure
+                self._disconnect()
+                self._connection().sendmail(sender, recipients, message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+            # the relay answered; the connection is still usable
+            if _permanent(e):
+                self._mark(message_id, FAILED, attempts + 1, str(e))
+            else:
+                self._retry(message_id, attempts, e)
+        except (smtplib.SMTPException, OSError) as e:
+            self._disconnect()
+            self._retry(message_id, attempts, e)
+        else:
+            self._last_used = time.time()
+            self._mark(message_id, SENT, attempts + 1, None)
+
+    def _retry(self, message_id: int, attempts: int, error: Exception):
+        attempts += 1
+        if attempts >= self.max_attempts:
+            self._mark(message_id, FAILED, attempts, str(error))
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?,"
+                               " lease_until = NULL WHERE id = ?",
+                               (QUEUED, attempts, time.time() + delay, str(error), message_id))
+
+    def _mark(self, message_id: int, status: str, attempts: int, error: Optional[str]):
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt = ?,"
+                               " lease_until = NULL WHERE id = ?", (status, attempts, error, time.time(), message_id))
+
+    def _purge(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE status IN (?, ?) AND next_attempt < ?",
+                               (SENT, FAILED, time.time() - KEEP_SENT))
+
+    # ---------------- SMTP connection ----------------
+    def _connection(self) -> smtplib.SMTP:
+        if self._smtp is None:
+            smtp = smtplib.SMTP(self.server, self.port, timeout=SMTP_TIMEOUT)
+            try:
+                smtp.ehlo()
+                if self.starttls:
+                    smtp.starttls()
+                    smtp.ehlo()
+                if self.password:
+                    smtp.login(self.sender, self.password)
+            except BaseException:
+                smtp.close()
+                raise
+            self._smtp = smtp
+        return self._smtp
+
+    def _disconnect(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
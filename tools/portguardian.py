@@ -1,9 +1,21 @@
-import psutil
+import os
 import socket
+import threading
+from functools import lru_cache
+
+import psutil
 
 # Define high-risk ports
 RISKY_PORTS = {21, 22, 23, 25, 80, 110, 135, 139, 143, 445, 3389, 5900}
 
+# Read listeners straight from /proc/net/tcp{,6} when available (Linux).
+# Set PORTGUARDIAN_PROCFS=0 to always go through psutil.net_connections().
+USE_PROCFS = os.environ.get("PORTGUARDIAN_PROCFS", "1") != "0" and os.path.exists("/proc/net/tcp")
+PROC_NET_FILES = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_LISTEN = "0A"
+
+
+@lru_cache(maxsize=4096)
 def get_service_name(port):
     """Return the service name for a port, with fallback."""
     try:
@@ -13,6 +25,123 @@ def get_service_name(port):
             return "Ephemeral/Dynamic"
         return "Unknown"
 
+
+def read_proc_listeners(paths=PROC_NET_FILES):
+    """(port, socket inode) for every TCP socket in LISTEN state."""
+    for path in paths:
+        try:
+            with open(path) as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 10 or fields[3] != TCP_LISTEN:
+                        continue
+                    port = int(fields[1].rsplit(":", 1)[1], 16)
+                    yield port, int(fields[9])
+        except OSError:
+            continue
+
+
+def scan_socket_owners(wanted):
+    """Map socket inode -> pid for the inodes in `wanted` by walking /proc/<pid>/fd."""
+    owners = {}
+    targets = {f"socket:[{inode}]": inode for inode in wanted}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        fd_dir = f"/proc/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        for fd in fds:
+            try:
+                inode = targets.get(os.readlink(f"{fd_dir}/{fd}"))
+            except OSError:
+                continue
+            if inode is not None:
+                owners[inode] = int(pid)
+                if len(owners) == len(targets):
+                    return owners
+    return owners
+
+
+class PortCollector:
+    """
+    Listening-port collector whose refresh cost stays flat on busy hosts.
+
+    Process names are memoized by (pid, create_time), so a recycled pid is
+    never mislabelled; service names are memoized by get_service_name().
+    With procfs, only LISTEN rows of /proc/net/tcp{,6} are parsed and the
+    expensive /proc/<pid>/fd walk runs only when a listener inode shows up
+    that has not been attributed (or given up on) before.
+    """
+
+    def __init__(self, use_procfs=USE_PROCFS):
+        self.use_procfs = use_procfs
+        self._lock = threading.Lock()
+        self._names = {}           # (pid, create_time) -> process name
+        self._owners = {}          # socket inode -> pid (procfs mode)
+        self._unowned = set()      # inodes the last fd walk could not attribute
+
+    def _process_name(self, pid, live):
+        if not pid:
+            return "System"
+        try:
+            proc = psutil.Process(pid)
+            key = (pid, proc.create_time())
+            name = self._names.get(key)
+            if name is None:
+                name = self._names[key] = proc.name()
+            live.add(key)
+            return name
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return "Unknown"
+
+    def _listeners_procfs(self):
+        listeners = list(read_proc_listeners())
+        inodes = {inode for _, inode in listeners}
+        unknown = inodes - self._owners.keys() - self._unowned
+        if unknown:
+            missing = inodes - self._owners.keys()
+            found = scan_socket_owners(missing)
+            self._owners.update(found)
+            self._unowned = missing - found.keys()
+        # forget closed sockets
+        for inode in self._owners.keys() - inodes:
+            del self._owners[inode]
+        self._unowned &= inodes
+        return [(port, self._owners.get(inode)) for port, inode in listeners]
+
+    def _listeners_psutil(self):
+        return [(conn.laddr.port, conn.pid) for conn in psutil.net_connections(kind='inet')
+                if conn.status == psutil.CONN_LISTEN and conn.laddr]
+
+    def collect(self):
+        """Same shape as get_listening_ports()."""
+        with self._lock:
+            listeners = self._listeners_procfs() if self.use_procfs else self._listeners_psutil()
+            ports_info = {}
+            live = set()
+            for port, pid in listeners:
+                if port not in ports_info:
+                    ports_info[port] = {
+                        "port": port,
+                        "service": get_service_name(port),
+                        "process": self._process_name(pid, live),
+                        "pid": pid,
+                        "risk": port in RISKY_PORTS
+                    }
+            # keep the name memo to processes that still hold listeners
+            for key in self._names.keys() - live:
+                del self._names[key]
+
+        return sorted(ports_info.values(), key=lambda x: x["port"])
+
+
+_collector = PortCollector()
+
+
 def get_listening_ports():
     """
     Returns a list of unique listening ports with info:
@@ -22,28 +151,4 @@ def get_listening_ports():
     - PID
     - risk flag
     """
-    ports_info = {}
-    
-    for conn in psutil.net_connections(kind='inet'):
-        if conn.status == psutil.CONN_LISTEN and conn.laddr:
-            port = conn.laddr.port
-
-            # Get process name
-            try:
-                proc = psutil.Process(conn.pid) if conn.pid else None
-                proc_name = proc.name() if proc else "System"
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                proc_name = "Unknown"
-
-            # Add or update unique entry by port
-            if port not in ports_info:
-                ports_info[port] = {
-                    "port": port,
-                    "service": get_service_name(port),
-                    "process": proc_name,
-                    "pid": conn.pid,
-                    "risk": port in RISKY_PORTS
-                }
-
-    # Return as list (sorted by port number)
-    return sorted(ports_info.values(), key=lambda x: x["port"])
+    return _collector.collect()
@@ -0,0 +1,208 @@
+# tools/porthistory.py
+import os
+import queue
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from tools.portguardian import RISKY_PORTS, get_service_name
+
+DEFAULT_PATH = os.environ.get("PORT_HISTORY_PATH", os.path.join(tempfile.gettempdir(), "cybersentinel_ports.sqlite3"))
+
+OPENED = 1
+CLOSED = 0
+
+# identifies this process as holder of the sampler lease
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _entry(port: int, process: str, pid: Optional[int]) -> Dict[str, Any]:
+    return {"port": port, "service": get_service_name(port), "process": process, "pid": pid,
+            "risk": port in RISKY_PORTS}
+
+
+def _identity(entry: Dict[str, Any]):
+    return entry["port"], entry.get("process"), entry.get("pid")
+
+
+class PortHistory:
+    """
+    Append-only, delta-encoded history of listening ports.
+
+    record() compares a snapshot with the last known state and appends one
+    row per listener that opened or closed, so an unchanged host costs
+    nothing no matter how often it is sampled. A listener whose process or
+    pid changes shows up as a close followed by an open.
+
+    Several processes (reloader, multiple workers) can share one database:
+    only the holder of the "sampler" lease records, the rest refresh() their
+    view from its rows.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " t INTEGER NOT NULL,"
+            " port INTEGER NOT NULL,"
+            " state INTEGER NOT NULL,"
+            " process TEXT,"
+            " pid INTEGER);"
+            "CREATE INDEX IF NOT EXISTS events_port_t ON events (port, t, id);"
+            "CREATE INDEX IF NOT EXISTS events_t ON events (t);"
+            "CREATE TABLE IF NOT EXISTS lease ("
+            " name TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " until REAL NOT NULL);"
+        )
+        self._current = {_identity(e): e for e in self.listening_at()}
+
+    def current(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._current.values(), key=lambda x: x["port"])
+
+    def claim(self, ttl: float, owner: str = PROCESS_ID) -> bool:
+        """Take or extend the sampler lease for `ttl` seconds; True if `owner` holds it."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO lease (name, owner, until) VALUES ('sampler', ?, ?)"
+                " ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, until = excluded.until"
+                " WHERE lease.owner = excluded.owner OR lease.until < ?",
+                (owner, now + ttl, now),
+            )
+        return cur.rowcount == 1
+
+    def refresh(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Reload the latest state from the database (rows written by another process); returns the changes."""
+        latest = {_identity(e): e for e in self.listening_at()}
+        with self._lock:
+            removed = [e for k, e in self._current.items() if k not in latest]
+            added = [e for k, e in latest.items() if k not in self._current]
+            self._current = latest
+        return {"added": sorted(added, key=lambda x: x["port"]), "removed": sorted(removed, key=lambda x: x["port"])}
+
+    def record(self, ports: List[Dict[str, Any]], t: Optional[float] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Store the changes between `ports` and the previous snapshot; returns them."""
+        t = int(time.time() if t is None else t)
+        snapshot = {_identity(p): _entry(p["port"], p.get("process"), p.get("pid")) for p in ports}
+        with self._lock:
+            removed = [e for k, e in self._current.items() if k not in snapshot]
+            added = [e for k, e in snapshot.items() if k not in self._current]
+            if removed or added:
+                rows = [(t, e["port"], CLOSED, e["process"], e["pid"]) for e in removed]
+                rows += [(t, e["port"], OPENED, e["process"], e["pid"]) for e in added]
+                with self._conn:
+                    self._conn.execute("BEGIN")
+                    self._conn.executemany(
+                        "INSERT INTO events (t, port, state, process, pid) VALUES (?, ?, ?, ?, ?)", rows)
+                self._current = snapshot
+        return {"added": sorted(added, key=lambda x: x["port"]), "removed": sorted(removed, key=lambda x: x["port"])}
+
+    # ---------------- queries ----------------
+    def listening_at(self, t: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Listeners that were open at time t (default: latest recorded state)."""
+        t = int(time.time() if t is None else t)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT e.port, e.state, e.process, e.pid FROM events e"
+                " JOIN (SELECT port, process, pid, MAX(id) AS last FROM events WHERE t <= ?"
+                "       GROUP BY port, process, pid) m ON e.id = m.last"
+                " WHERE e.state = ? ORDER BY e.port",
+                (t, OPENED),
+            ).fetchall()
+        return [_entry(port, process, pid) for port, _, process, pid in rows]
+
+    def first_seen(self, port: int) -> Optional[int]:
+        """When `port` was first seen listening, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(t) FROM events WHERE port = ? AND state = ?",
+                                     (port, OPENED)).fetchone()
+        return row[0]
+
+    def port_events(self, port: int, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Open/close events for one port, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t, state, process, pid FROM events WHERE port = ? AND t >= ? AND t <= ? ORDER BY t, id",
+                (port, int(start or 0), int(end if end is not None else time.time())),
+            ).fetchall()
+        return [{"t": t, "event": "opened" if state == OPENED else "closed", "port": port,
+                 "process": process, "pid": pid} for t, state, process, pid in rows]
+
+    def changes(self, start: float, end: Optional[float] = None, risky_only: bool = False) -> List[Dict[str, Any]]:
+        """Every open/close event in [start, end], oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t, port, state, process, pid FROM events WHERE t >= ? AND t <= ? ORDER BY t, id",
+                (int(start), int(end if end is not None else time.time())),
+            ).fetchall()
+        events = [{"t": t, "event": "opened" if state == OPENED else "closed", "port": port,
+                   "process": process, "pid": pid, "risk": port in RISKY_PORTS}
+                  for t, port, state, process, pid in rows]
+        return [e for e in events if e["risk"]] if risky_only else events
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChangeFeed:
+    """
+    Fan-out of listener diffs to live subscribers (one queue each).
+
+    The sampler publishes each non-empty diff once. A subscriber that falls
+    more than `backlog` diffs behind is reset to a single "resync" marker, so
+    a stalled client can never make the sampler block or memory grow.
+    """
+
+    def __init__(self, backlog: int = 100):
+        self.backlog = backlog
+        self._lock = threading.Lock()
+        self._subscribers: List[queue.Queue] = []
+
+    def subscribe(self) -> queue.Queue:
+        q = queue.Queue(maxsize=self.backlog)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    def publish(self, diff: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(diff)
+            except queue.Full:
+                with q.mutex:
+                    q.queue.clear()
+                q.put_nowait({"resync": True})
+
+
+port_feed = ChangeFeed()
+
+_default_history: Optional[PortHistory] = None
+_default_lock = threading.Lock()
+
+
+def get_port_history() -> PortHistory:
+    """Process-wide history at PORT_HISTORY_PATH."""
+    global _default_history
+    with _default_lock:
+        if _default_history is None:
+            _default_history = PortHistory()
+        return _default_history
@@ -0,0 +1,197 @@
+# tools/resolver.py
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import dns.asyncresolver  # pip install dnspython
+    import dns.exception
+    import dns.resolver
+except ImportError:  # fall back to the system resolver via getaddrinfo
+    dns = None
+
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_TTL = 300          # used when the lookup path does not expose TTLs
+MIN_TTL = 5
+MAX_TTL = 3600
+NEGATIVE_TTL = 60
+MAX_ENTRIES = 10000
+
+RECORD_TYPES = ("A", "AAAA")
+
+
+def is_ip(s: str) -> bool:
+    try:
+        ipaddress.ip_address(s)
+        return True
+    except ValueError:
+        return False
+
+
+class Resolver:
+    """
+    Async A/AAAA resolver with an in-process cache.
+    Positive answers are kept for their DNS TTL (clamped to [min_ttl, max_ttl]),
+    NXDOMAIN / failures for negative_ttl. Uses dnspython when available so
+    nameservers and TTLs are honoured, otherwise getaddrinfo with default_ttl.
+    Names dnspython finds no records for (localhost, /etc/hosts entries) are
+    retried through getaddrinfo.
+
+    resolve_async(name) / resolve(name) return the same shape BannerHunter
+    always used: {"hostname", "aliases", "ips"} or {"error": "..."}.
+    """
+
+    def __init__(self, nameservers: Optional[List[str]] = None, port: int = 53, timeout: float = DEFAULT_TIMEOUT,
+                 min_ttl: int = MIN_TTL, max_ttl: int = MAX_TTL, negative_ttl: int = NEGATIVE_TTL,
+                 default_ttl: int = DEFAULT_TTL, max_entries: int = MAX_ENTRIES):
+        self.nameservers = nameservers
+        self.port = int(port)
+        self.timeout = float(timeout)
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+
+        # (name, rdtype) -> (expires_at, canonical_name, ips, error)
+        self._cache: Dict[Tuple[str, str], Tuple[float, str, List[str], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._dns = None           # one dnspython resolver, so resolv.conf is read once
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------- cache ----------------
+    def _get(self, key) -> Optional[Tuple[str, List[str], Optional[str]]]:
+        with self._lock:
+            item = self._cache.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            return item[1:]
+
+    def _put(self, key, canonical: str, ips: List[str], error: Optional[str], ttl: float):
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._evict()
+            self._cache[key] = (time.monotonic() + ttl, canonical, ips, error)
+
+    def _evict(self):
+        now = time.monotonic()
+        for k in [k for k, v in self._cache.items() if v[0] < now]:
+            del self._cache[k]
+        while len(self._cache) >= self.max_entries:
+            del self._cache[next(iter(self._cache))]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def _clamp(self, ttl: float) -> float:
+        return max(self.min_ttl, min(self.max_ttl, ttl))
+
+    # ---------------- lookups ----------------
+    def _dns_resolver(self):
+        with self._lock:
+            if self._dns is None:
+                r = dns.asyncresolver.Resolver(configure=not self.nameservers)
+                if self.nameservers:
+                    r.nameservers = list(self.nameservers)
+                    r.port = self.port
+                r.lifetime = self.timeout
+                self._dns = r
+            return self._dns
+
+    async def _query_dnspython(self, name: str, rdtype: str):
+        try:
+            answer = await self._dns_resolver().resolve(name, rdtype, raise_on_no_answer=False)
+        except dns.resolver.NXDOMAIN:
+            return await self._query_hosts(name, rdtype, (name, [], "NXDOMAIN", self.negative_ttl))
+        except (dns.exception.DNSException, OSError) as e:
+            return name, [], str(e) or e.__class__.__name__, self.negative_ttl
+
+        canonical = answer.canonical_name.to_text(omit_final_dot=True)
+        if answer.rrset is None:
+            # NODATA: the name exists but has no records of this type
+            return await self._query_hosts(name, rdtype, (canonical, [], None, self.negative_ttl))
+        return canonical, [r.to_text() for r in answer.rrset], None, self._clamp(answer.rrset.ttl)
+
+    async def _query_hosts(self, name: str, rdtype: str, dns_answer):
+        """dnspython does not read /etc/hosts; give getaddrinfo a go before reporting no records."""
+        canonical, ips, error, ttl = await self._query_system(name, rdtype)
+        return (canonical, ips, None, ttl) if ips else dns_answer
+
+    async def _query_system(self, name: str, rdtype: str):
+        family = socket.AF_INET if rdtype == "A" else socket.AF_INET6
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await asyncio.wait_for(
+                loop.getaddrinfo(name, None, family=family, type=socket.SOCK_STREAM, flags=socket.AI_CANONNAME),
+                self.timeout,
+            )
+        except (socket.gaierror, asyncio.TimeoutError, OSError) as e:
+            return name, [], str(e) or e.__class__.__name__, self.negative_ttl
+        canonical = next((i[3] for i in infos if i[3]), name)
+        ips = list(dict.fromkeys(i[4][0] for i in infos))
+        return canonical, ips, None, self._clamp(self.default_ttl)
+
+    async def _lookup(self, name: str, rdtype: str) -> Tuple[str, List[str], Optional[str]]:
+        key = (name, rdtype)
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        query = self._query_dnspython if dns is not None else self._query_system
+        canonical, ips, error, ttl = await query(name, rdtype)
+        self._put(key, canonical, ips, error, ttl)
+        return canonical, ips, error
+
+    async def resolve_async(self, name: str, record_types=RECORD_TYPES) -> Dict[str, Any]:
+        name = (name or "").strip().rstrip(".").lower()
+        if not name:
+            return {"error": "DNS resolution failed: empty name"}
+        if is_ip(name):
+            return {"hostname": name, "ips": [name], "aliases": []}
+
+        answers = await asyncio.gather(*(self._lookup(name, t) for t in record_types))
+        ips: List[str] = []
+        canonical = name
+        errors = []
+        for cname, addrs, error in answers:
+            ips.extend(a for a in addrs if a not in ips)
+            if addrs and cname:
+                canonical = cname
+            if error:
+                errors.append(error)
+
+        if not ips:
+            return {"error": f"DNS resolution failed: {errors[0] if errors else 'no A/AAAA records'}"}
+        aliases = [name] if canonical != name else []
+        return {"hostname": canonical, "aliases": aliases, "ips": ips}
+
+    def resolve(self, name: str, record_types=RECORD_TYPES) -> Dict[str, Any]:
+        """Blocking wrapper for callers without an event loop (Flask handlers)."""
+        return asyncio.run(self.resolve_async(name, record_types))
+
+
+_default_resolver: Optional[Resolver] = None
+_default_lock = threading.Lock()
+
+
+def get_resolver() -> Resolver:
+    """
+    Process-wide resolver shared by the tools so repeated scans reuse the cache.
+    DNS_NAMESERVERS (comma separated) and DNS_PORT override the system config.
+    """
+    global _default_resolver
+    with _default_lock:
+        if _default_resolver is None:
+            ns = [n.strip() for n in os.environ.get("DNS_NAMESERVERS", "").split(",") if n.strip()]
+            _default_resolver = Resolver(nameservers=ns or None, port=int(os.environ.get("DNS_PORT", 53)))
+        return _default_resolver
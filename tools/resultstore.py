@@ -0,0 +1,125 @@
+# tools/resultstore.py
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+DEFAULT_TTL = int(os.environ.get("RESULT_TTL", 600))
+MAX_ENTRIES = 256
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result_id: Optional[str] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultStore:
+    """
+    Short-lived store of tool results keyed by (tool, target, params).
+
+    get_or_run() returns a fresh stored result if there is one, joins an
+    identical scan that is already running, or runs the scan and stores it.
+    Each stored result gets an opaque result_id that templates carry along so
+    follow-up actions (email report, re-render) reuse exactly what was shown.
+    """
+
+    def __init__(self, ttl: int = DEFAULT_TTL, max_entries: int = MAX_ENTRIES):
+        self.ttl = int(ttl)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}   # result_id -> entry
+        self._by_key: Dict[str, str] = {}               # key -> latest result_id
+        self._inflight: Dict[str, _InFlight] = {}
+
+    @staticmethod
+    def make_key(tool: str, target: str, params: Optional[Dict[str, Any]] = None) -> str:
+        return json.dumps([tool, (target or "").strip().lower(), params or {}], sort_keys=True, default=str)
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.time() - entry["created"] <= self.ttl
+
+    def _prune(self):
+        now = time.time()
+        for rid in [rid for rid, e in self._entries.items() if now - e["created"] > self.ttl]:
+            self._drop(rid)
+        while len(self._entries) >= self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, rid: str):
+        entry = self._entries.pop(rid, None)
+        if entry and self._by_key.get(entry["key"]) == rid:
+            del self._by_key[entry["key"]]
+
+    def put(self, tool: str, target: str, params: Optional[Dict[str, Any]], result: Any) -> str:
+        key = self.make_key(tool, target, params)
+        rid = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            self._entries[rid] = {"key": key, "tool": tool, "target": target, "params": params or {},
+                                  "result": result, "created": time.time()}
+            self._by_key[key] = rid
+        return rid
+
+    def get(self, result_id: Optional[str], tool: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Stored entry for result_id if still fresh (and from `tool`, when given)."""
+        if not result_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(result_id)
+        if not self._fresh(entry) or (tool and entry["tool"] != tool):
+            return None
+        return entry
+
+    def latest(self, tool: str, target: str, params: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            rid = self._by_key.get(self.make_key(tool, target, params))
+            entry = self._entries.get(rid) if rid else None
+        return (rid, entry["result"]) if self._fresh(entry) else None
+
+    def get_or_run(self, tool: str, target: str, params: Optional[Dict[str, Any]], fn: Callable[[], Any],
+                   refresh: bool = False) -> Tuple[str, Any]:
+        """
+        (result_id, result) for this scan. refresh=True skips the stored copy
+        but still joins an identical in-flight scan.
+        """
+        key = self.make_key(tool, target, params)
+        while True:
+            with self._lock:
+                if not refresh:
+                    rid = self._by_key.get(key)
+                    entry = self._entries.get(rid) if rid else None
+                    if self._fresh(entry):
+                        return rid, entry["result"]
+                flight = self._inflight.get(key)
+                owner = flight is None
+                if owner:
+                    flight = self._inflight[key] = _InFlight()
+
+            if not owner:
+                flight.done.wait()
+                if flight.error is not None:
+                    raise flight.error
+                entry = self.get(flight.result_id)
+                if entry is not None:
+                    return flight.result_id, entry["result"]
+                refresh = False
+                continue
+
+            try:
+                result = fn()
+                flight.result_id = self.put(tool, target, params, result)
+                return flight.result_id, result
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                flight.done.set()
+
+
+results = ResultStore()
@@ -0,0 +1,116 @@
+# tools/tlsinspect.py
+import hashlib
+import ssl
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from cryptography import x509
+
+CERT_CACHE_SIZE = 4096
+
+OID_NAMES = {
+    "2.5.4.3": "CN",
+    "2.5.4.6": "C",
+    "2.5.4.7": "L",
+    "2.5.4.8": "ST",
+    "2.5.4.10": "O",
+    "2.5.4.11": "OU",
+    "1.2.840.113549.1.9.1": "emailAddress",
+}
+
+# fingerprint -> parsed details, least recently used first
+_cert_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_cert_cache_lock = threading.Lock()
+
+
+def make_client_context() -> ssl.SSLContext:
+    """
+    Client context for inspection, not validation: no chain or hostname
+    checks, and legacy protocols/ciphers allowed so old servers still report.
+    """
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    try:
+        ctx.minimum_version = ssl.TLSVersion.MINIMUM_SUPPORTED
+        ctx.set_ciphers("ALL:@SECLEVEL=0")
+    except (ValueError, ssl.SSLError):
+        pass
+    return ctx
+
+
+def _name(name: x509.Name) -> str:
+    parts = []
+    for attr in name:
+        oid = attr.oid.dotted_string
+        value = attr.value if isinstance(attr.value, str) else attr.value.decode("utf-8", errors="replace")
+        parts.append(f"{OID_NAMES.get(oid, oid)}={value}")
+    return ", ".join(parts)
+
+
+def _san(cert: x509.Certificate) -> List[str]:
+    try:
+        ext = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+    except x509.ExtensionNotFound:
+        return []
+    return ([f"DNS:{n}" for n in ext.get_values_for_type(x509.DNSName)]
+            + [f"IP:{n}" for n in ext.get_values_for_type(x509.IPAddress)]
+            + [f"email:{n}" for n in ext.get_values_for_type(x509.RFC822Name)])
+
+
+def parse_certificate(der: bytes) -> Dict[str, Any]:
+    """Subject, issuer, validity and SAN from a DER certificate."""
+    cert = x509.load_der_x509_certificate(der)
+    not_before, not_after = cert.not_valid_before_utc, cert.not_valid_after_utc
+    return {
+        "subject": _name(cert.subject),
+        "issuer": _name(cert.issuer),
+        "san": _san(cert),
+        "not_before": not_before.isoformat(),
+        "not_after": not_after.isoformat(),
+        "_not_after": not_after,
+    }
+
+
+def describe_certificate(der: bytes) -> Dict[str, Any]:
+    """
+    Parsed certificate details, cached by SHA-256 fingerprint so hosts that
+    share a certificate (load-balancer pools) are parsed once.
+    """
+    fp = hashlib.sha256(der).hexdigest()
+    with _cert_cache_lock:
+        info = _cert_cache.get(fp)
+        if info is not None:
+            _cert_cache.move_to_end(fp)
+    if info is None:
+        try:
+            info = parse_certificate(der)
+        except Exception as e:
+            info = {"error": f"certificate parse failed: {e}", "_not_after": None}
+        info["fingerprint_sha256"] = fp
+        with _cert_cache_lock:
+            _cert_cache[fp] = info
+            while len(_cert_cache) > CERT_CACHE_SIZE:
+                _cert_cache.popitem(last=False)
+
+    out = {k: v for k, v in info.items() if not k.startswith("_")}
+    not_after = info.get("_not_after")
+    if not_after:
+        days = (not_after - datetime.now(timezone.utc)).days
+        out["days_left"] = days
+        out["expired"] = days < 0
+    return out
+
+
+def inspect_ssl_object(ssl_obj) -> Dict[str, Any]:
+    """TLS details for an established ssl.SSLSocket / SSLObject."""
+    out: Dict[str, Any] = {"protocol": ssl_obj.version(), "cipher": None}
+    cipher = ssl_obj.cipher()
+    if cipher:
+        out["cipher"] = cipher[0]
+    der = ssl_obj.getpeercert(binary_form=True)
+    if der:
+        out.update(describe_certificate(der))
+    return out
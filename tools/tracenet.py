@@ -1,9 +1,19 @@
 # tools/tracenet.py
 
 import requests
-from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib.parse import quote, urlparse
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import io
 import os
+import queue
 import re
+import sqlite3
+import threading
+import time
+
+from tools.breachcache import get_breach_cache, normalize_email
 
 PLATFORMS = {
     "GitHub": "https://github.com/{username}",
@@ -23,6 +33,107 @@ HEADERS = {
     "User-Agent": "PortGuardian-TraceNet/1.0 (+https://yourproject.example)"
 }
 REQUEST_TIMEOUT = 6
+POOL_SIZE = 10
+DRAIN_LIMIT = 64 * 1024     # GET bodies up to this size are read so the connection is reused
+MAX_WORKERS = len(PLATFORMS)
+
+# Bulk mode: sustained requests/second and burst per platform. Conservative
+# defaults for unauthenticated profile pages; tune per deployment.
+DEFAULT_RATE = (1.0, 3)
+PLATFORM_RATES = {
+    "GitHub": (2.0, 5),
+    "Twitter": (0.5, 2),
+    "Instagram": (0.2, 1),
+    "LinkedIn": (0.2, 1),
+    "Reddit": (0.5, 2),
+}
+# HIBP rate depends on the API key tier (requests per minute)
+HIBP_API_URL = os.getenv("HIBP_API_URL", "https://haveibeenpwned.com/api/v3").rstrip("/")
+HIBP_RATE_PER_MIN = float(os.getenv("HIBP_RATE_PER_MIN", 10))
+HIBP_MAX_RETRIES = 2
+HIBP_MAX_WAIT = 15.0
+BULK_WORKERS_PER_PLATFORM = 2
+BULK_MAX_RETRIES = 3
+BULK_MAX_TARGETS = 1000
+BULK_POLL = 1.0            # seconds between checks that bulk workers are still alive
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 300.0
+MIN_RATE_FRACTION = 0.1
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def session_for(url: str) -> requests.Session:
+    """
+    Keep-alive Session per platform host, shared by every scan in the process,
+    so repeat probes skip the TCP/TLS handshake.
+    """
+    host = urlparse(url).netloc
+    with _sessions_lock:
+        sess = _sessions.get(host)
+        if sess is None:
+            sess = requests.Session()
+            sess.headers.update(HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+            sess.mount("https://", adapter)
+            sess.mount("http://", adapter)
+            _sessions[host] = sess
+        return sess
+
+
+def _retry_after(r) -> float:
+    try:
+        return float(r.headers.get("Retry-After", 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _drain(r, limit: int = DRAIN_LIMIT):
+    """Read off a small body so its connection goes back to the pool; bigger ones are dropped on close."""
+    read = 0
+    for chunk in r.iter_content(16384):
+        read += len(chunk)
+        if read > limit:
+            break
+
+
+def _fetch_status(url: str):
+    """
+    HEAD the URL (GET when the site answers 405/501) through the host's
+    keep-alive Session. A GET body is read up to DRAIN_LIMIT so the
+    connection can be reused. Returns (http_status_or_None, retry_after_seconds).
+    """
+    sess = session_for(url)
+    try:
+        r = sess.head(url, timeout=REQUEST_TIMEOUT, allow_redirects=True)
+        if r.status_code in (405, 501):
+            with sess.get(url, timeout=REQUEST_TIMEOUT, allow_redirects=True, stream=True) as r:
+                _drain(r)
+        return r.status_code, _retry_after(r)
+    except requests.RequestException:
+        return None, 0.0
+
+
+def connection_stats():
+    """
+    Connections opened and requests sent per host by the shared Sessions;
+    far fewer connections than requests means keep-alive pooling works.
+    """
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+    stats = {}
+    for sess in sessions:
+        for adapter in set(sess.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                entry = stats.setdefault(pool.host, {"connections": 0, "requests": 0})
+                entry["connections"] += pool.num_connections
+                entry["requests"] += pool.num_requests
+    return stats
 
 
 def probe_profile(username: str, platform_url: str):
@@ -30,42 +141,48 @@ def probe_profile(username: str, platform_url: str):
     Probe a platform URL for the username. Returns (found_bool, url, http_status_or_None)
     """
     url = platform_url.format(username=quote(username))
-    try:
-        r = requests.get(url, headers=HEADERS, timeout=REQUEST_TIMEOUT, allow_redirects=True)
-        status = r.status_code
-        if status in (200, 301, 302, 403):
-            return True, url, status
-        return False, url, status
-    except requests.RequestException:
-        return False, url, None
+    status, _ = _fetch_status(url)
+    if status in (200, 301, 302, 403):
+        return True, url, status
+    return False, url, status
 
 
-def scan_username(username: str):
+def scan_username(username: str, max_workers: int = MAX_WORKERS, progress=None, stop: threading.Event = None):
     """
     Scan all PLATFORMS for the username and return a list of result dicts.
+    Platforms are probed concurrently (max_workers <= 1 probes them one by one);
+    results keep PLATFORMS order. progress(done, total) is called per platform;
+    once `stop` is set the remaining platforms are skipped (left out).
     """
-    results = []
-    for name, fmt in PLATFORMS.items():
+    done = 0
+    done_lock = threading.Lock()
+
+    def _probe(item):
+        nonlocal done
+        name, fmt = item
+        if stop is not None and stop.is_set():
+            return None
         found, url, status = probe_profile(username, fmt)
-        results.append({
+        if progress:
+            with done_lock:
+                done += 1
+                progress(done, len(PLATFORMS))
+        return {
             "platform": name,
             "url": url,
             "found": bool(found),
             "http_status": status
-        })
-    return results
+        }
 
+    if max_workers <= 1:
+        return [r for r in map(_probe, PLATFORMS.items()) if r is not None]
 
-def hibp_breaches_for_email(email: str):
-    """
-    Query HaveIBeenPwned for breaches related to an email.
-    Requires HIBP_API_KEY environment variable if you want a live check.
-    """
-    api_key = os.getenv("HIBP_API_KEY")
-    if not api_key:
-        return {"status": "no_api", "breaches": None}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(PLATFORMS))) as pool:
+        return [r for r in pool.map(_probe, PLATFORMS.items()) if r is not None]
 
-    url = f"https://haveibeenpwned.com/api/v3/breachedaccount/{quote(email)}"
+
+def _hibp_request(email: str, api_key: str):
+    url = f"{HIBP_API_URL}/breachedaccount/{quote(email)}"
     headers = {
         "hibp-api-key": api_key,
         "user-agent": "PortGuardian-TraceNet/1.0"
@@ -76,11 +193,260 @@ def hibp_breaches_for_email(email: str):
             return {"status": "ok", "breaches": r.json()}
         if r.status_code == 404:
             return {"status": "ok", "breaches": []}
+        if r.status_code == 429:
+            return {"status": "rate_limited", "breaches": None, "retry_after": _retry_after(r)}
         return {"status": "error", "breaches": None}
-    except requests.RequestException:
+    except (requests.RequestException, ValueError):
         return {"status": "error", "breaches": None}
 
 
+def _cache_get(email: str):
+    try:
+        return get_breach_cache().get(email)
+    except sqlite3.Error:
+        return None
+
+
+def _cache_put(email: str, result):
+    try:
+        get_breach_cache().put(email, result)
+    except sqlite3.Error:
+        pass
+
+
+def hibp_breaches_for_email(email: str, use_cache: bool = True, max_wait: float = HIBP_MAX_WAIT,
+                            stop: threading.Event = None):
+    """
+    Query HaveIBeenPwned for breaches related to an email.
+    Requires HIBP_API_KEY environment variable if you want a live check.
+    Fresh results come from the on-disk cache; live calls are spaced by the
+    shared HIBP token bucket and retried on 429 as long as the wait stays
+    under `max_wait` seconds.
+    """
+    api_key = os.getenv("HIBP_API_KEY")
+    if not api_key:
+        return {"status": "no_api", "breaches": None}
+
+    email = normalize_email(email)
+    if use_cache:
+        cached = _cache_get(email)
+        if cached is not None:
+            return cached
+
+    bucket = bucket_for("HIBP")
+    result = {"status": "rate_limited", "breaches": None}
+    for _ in range(HIBP_MAX_RETRIES + 1):
+        if bucket.blocked_until - time.monotonic() > max_wait:
+            break
+        if not bucket.acquire(stop):
+            break
+        result = _hibp_request(email, api_key)
+        if result["status"] != "rate_limited":
+            bucket.success()
+            break
+        bucket.backoff(result.get("retry_after", 0))
+
+    if result["status"] == "ok":
+        _cache_put(email, result)
+    elif result["status"] == "rate_limited":
+        # seconds until the shared HIBP bucket lets a request through again
+        result["retry_after"] = int(max(result.get("retry_after", 0), bucket.blocked_until - time.monotonic(), 0) + 0.999)
+    return result
+
+
+def hibp_batch_lookup(emails, stop: threading.Event = None):
+    """
+    Look up many emails, yielding (email, result) pairs: cache hits first,
+    then live lookups one at a time through the HIBP rate-limit queue.
+    """
+    misses = []
+    for email in dict.fromkeys(normalize_email(e) for e in emails if e):
+        cached = _cache_get(email) if os.getenv("HIBP_API_KEY") else None
+        if cached is not None:
+            yield email, cached
+        else:
+            misses.append(email)
+
+    for email in misses:
+        if stop is not None and stop.is_set():
+            return
+        yield email, hibp_breaches_for_email(email, use_cache=False, max_wait=BACKOFF_MAX, stop=stop)
+
+
+# ---------------- Bulk mode ----------------
+class TokenBucket:
+    """
+    Thread-safe token bucket with AIMD backoff: a 429 halves the rate and
+    pauses the bucket (Retry-After or exponential), successes creep the rate
+    back up to its configured ceiling.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, stop: threading.Event = None) -> bool:
+        """Block until a token is available; False if `stop` was set meanwhile."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            if stop is None:
+                time.sleep(wait)
+            elif stop.wait(wait):
+                return False
+
+    def backoff(self, retry_after: float = 0.0):
+        with self._lock:
+            self.strikes += 1
+            delay = retry_after or min(BACKOFF_MAX, BACKOFF_BASE * (2 ** (self.strikes - 1)))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.tokens = 0.0
+
+    def success(self):
+        with self._lock:
+            self.strikes = 0
+            self.rate = min(self.max_rate, self.rate * 1.05)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(name: str) -> TokenBucket:
+    """Process-wide bucket per platform, shared by every bulk run."""
+    with _buckets_lock:
+        b = _buckets.get(name)
+        if b is None:
+            if name == "HIBP":
+                b = TokenBucket(HIBP_RATE_PER_MIN / 60.0, 1)
+            else:
+                b = TokenBucket(*PLATFORM_RATES.get(name, DEFAULT_RATE))
+            _buckets[name] = b
+        return b
+
+
+def parse_bulk_targets(text: str, limit: int = BULK_MAX_TARGETS):
+    """
+    Usernames / emails from pasted text or CSV: every non-empty cell counts,
+    duplicates are dropped, order is kept.
+    """
+    seen = {}
+    for row in csv.reader(io.StringIO(text or "")):
+        for cell in row:
+            for item in cell.split():
+                item = item.strip().strip("\"'")
+                if item and not item.startswith("#") and item.lower() not in seen:
+                    seen[item.lower()] = item
+                    if len(seen) >= limit:
+                        return list(seen.values())
+    return list(seen.values())
+
+
+def bulk_recon(targets, platforms=None):
+    """
+    Probe many usernames / emails, yielding one result dict per probe as it
+    completes. Each platform (and HIBP) gets its own workers and token bucket,
+    so every site runs at its own allowed rate in parallel; 429s back the
+    bucket off and requeue the probe up to BULK_MAX_RETRIES times. Emails go
+    through hibp_batch_lookup(), so cached breaches come back first.
+
+    Username results: {"type": "username", "target", "platform", "url", "found", "http_status"}
+    Email results:    {"type": "email", "target", **hibp_breaches_for_email()}
+    Closing the generator stops the workers.
+    """
+    platforms = platforms or PLATFORMS
+    usernames = [t for t in targets if not TraceNet(t).is_email()]
+    emails = list(dict.fromkeys(normalize_email(t) for t in targets if TraceNet(t).is_email()))
+
+    out = queue.Queue()
+    stop = threading.Event()
+    jobs = {}
+    if usernames:
+        for name in platforms:
+            jobs[name] = queue.Queue()
+            for u in usernames:
+                jobs[name].put((u, 0))
+    expected = len(usernames) * len(platforms) + len(emails)
+
+    def _probe(name, target):
+        url = platforms[name].format(username=quote(target))
+        status, retry_after = _fetch_status(url)
+        res = {"type": "username", "target": target, "platform": name, "url": url,
+               "found": status in (200, 301, 302, 403), "http_status": status}
+        return res, status == 429, retry_after
+
+    def _worker(name):
+        bucket = bucket_for(name)
+        q = jobs[name]
+        while not stop.is_set():
+            try:
+                target, attempt = q.get_nowait()
+            except queue.Empty:
+                return
+            if not bucket.acquire(stop):
+                return
+            try:
+                res, limited, retry_after = _probe(name, target)
+            except Exception as e:
+                res, limited, retry_after = {"type": "username", "target": target, "platform": name,
+                                             "error": str(e)}, False, 0
+            if limited:
+                bucket.backoff(retry_after)
+                if attempt < BULK_MAX_RETRIES:
+                    q.put((target, attempt + 1))
+                    continue
+                res["error"] = "rate_limited"
+            else:
+                bucket.success()
+            out.put(res)
+
+    def _email_worker():
+        done = set()
+        try:
+            for email, res in hibp_batch_lookup(emails, stop=stop):
+                done.add(email)
+                out.put({"type": "email", "target": email, **res})
+        except Exception as e:
+            for email in emails:
+                if email not in done:
+                    out.put({"type": "email", "target": email, "status": "error", "breaches": None, "error": str(e)})
+
+    threads = [threading.Thread(target=_worker, args=(name,), daemon=True)
+               for name in jobs for _ in range(BULK_WORKERS_PER_PLATFORM)]
+    if emails:
+        threads.append(threading.Thread(target=_email_worker, daemon=True))
+    for t in threads:
+        t.start()
+
+    try:
+        received = 0
+        while received < expected:
+            try:
+                res = out.get(timeout=BULK_POLL)
+            except queue.Empty:
+                # a worker that died without reporting must not hang the stream
+                if not any(t.is_alive() for t in threads) and out.empty():
+                    return
+                continue
+            received += 1
+            yield res
+    finally:
+        stop.set()
+
+
 class TraceNet:
     """
     Unified class: detect if target is email or username and run the appropriate check.
@@ -93,10 +459,12 @@ class TraceNet:
     def is_email(self):
         return bool(re.match(r"[^@]+@[^@]+\.[^@]+", self.target))
 
-    def run_recon(self):
+    def run_recon(self, progress=None, stop=None):
         if self.is_email():
-            result = hibp_breaches_for_email(self.target)
+            result = hibp_breaches_for_email(self.target, stop=stop)
+            if progress:
+                progress(1, 1)
             return {"type": "email", "target": self.target, **result}
         else:
-            results = scan_username(self.target)
+            results = scan_username(self.target, progress=progress, stop=stop)
             return {"type": "username", "target": self.target, "results": results}